@@ -1,6 +1,16 @@
-from pydantic import BaseModel, EmailStr
-from typing import Literal, Optional
-from datetime import datetime
+from pydantic import AfterValidator, BaseModel, EmailStr
+from typing import Annotated, Literal, Optional
+from datetime import datetime, timezone
+
+#admission timestamps are whole-second TIMESTAMP columns and every connection runs in UTC (database.py), so client
+#datetimes are converted to naive UTC without fractions - the values the app computes with (census deltas, day buckets)
+#are then exactly the ones MySQL stores, and never mix offset-aware with naive datetimes
+def stored_datetime(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.replace(microsecond=0)
+
+StoredDatetime = Annotated[datetime, AfterValidator(stored_datetime)]
 
 
 class Province(BaseModel):
@@ -39,7 +49,7 @@ class AdmittedPatient(BaseModel):
     patient_id: int
     diagnosis: str
     status: Literal["sick", "healthy"] = "sick"
-    admission_date: Optional[datetime] = None
+    admission_date: Optional[StoredDatetime] = None
 
 #Token
 class PatientToken(BaseModel):
@@ -0,0 +1,107 @@
+import csv
+import io
+import json
+from fastapi import HTTPException, Request, status
+from pydantic import ValidationError
+from .database import Database
+
+#bulk imports - NDJSON or CSV bodies, validated per row and written with executemany in chunked transactions
+CSV_MEDIA_TYPES = ("text/csv", "application/csv")
+
+def parse_rows(body: bytes, content_type: str):
+    #yields (line, data, error) - line numbers are 1-based and count the CSV header
+    text = body.decode("utf-8-sig")
+    media_type = content_type.split(";")[0].strip().lower()
+
+    if media_type in CSV_MEDIA_TYPES:
+        reader = csv.DictReader(io.StringIO(text))
+        for row in reader:
+            #empty CSV cells mean "not provided" so optional fields fall back to their defaults
+            yield reader.line_num, {key: value for key, value in row.items() if value not in ("", None)}, None
+        return
+
+    for line, raw in enumerate(text.splitlines(), start=1):
+        if not raw.strip():
+            continue
+        try:
+            data = json.loads(raw)
+        except json.JSONDecodeError as e:
+            yield line, None, f"Invalid JSON: {e.msg}"
+            continue
+
+        if not isinstance(data, dict):
+            yield line, None, "Each line must be a JSON object"
+            continue
+
+        yield line, data, None
+
+async def read_rows(request: Request, model, max_rows: int):
+    #returns ([(line, model instance)], [error dicts]) for the request body
+    body = await request.body()
+    valid, errors = [], []
+
+    for line, data, error in parse_rows(body, request.headers.get("content-type", "")):
+        if len(valid) + len(errors) >= max_rows:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Imports are limited to {max_rows} rows per request"
+            )
+
+        if error:
+            errors.append({"line": line, "error": error})
+            continue
+
+        try:
+            valid.append((line, model(**data)))
+        except ValidationError as e:
+            errors.append({"line": line, "error": "; ".join(f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors())})
+
+    return valid, errors
+
+async def existing_values(db: Database, table: str, column: str, values) -> set:
+    values = list(set(values))
+    if not values:
+        return set()
+
+    await db.cursor.execute(f"SELECT {column} FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(values))})", tuple(values))
+    return {row[column] for row in await db.cursor.fetchall()}
+
+def chunks(rows, size: int):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+async def insert_chunk(db: Database, sql: str, rows, on_insert=None):
+    #rows are (line, values) - the whole chunk goes in one transaction; if it fails, rows are retried one by one
+    #so a single bad row only costs itself. on_insert(db, rows) runs in the same transaction before each commit
+    #returns (inserted, errors)
+    try:
+        await db.cursor.executemany(sql, [values for _, values in rows])
+        if on_insert:
+            await on_insert(db, rows)
+        await db.conn.commit()
+        return len(rows), []
+
+    except Exception:
+        await db.conn.rollback()
+
+    inserted, errors = 0, []
+    for line, values in rows:
+        try:
+            await db.cursor.execute(sql, values)
+            if on_insert:
+                await on_insert(db, [(line, values)])
+            await db.conn.commit()
+            inserted += 1
+        except Exception as e:
+            await db.conn.rollback()
+            errors.append({"line": line, "error": str(e)})
+
+    return inserted, errors
+
+def report(received: int, imported: int, errors):
+    return {
+        "received": received,
+        "imported": imported,
+        "failed": len(errors),
+        "errors": sorted(errors, key=lambda error: error["line"])
+    }
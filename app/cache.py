@@ -0,0 +1,74 @@
+import asyncio
+import time
+from .database import Database, pool
+from .config import settings
+
+class ProvinceCache:
+    #read-through, in-process cache of the provinces table keyed by id
+    #writes in this worker update it directly; ttl (seconds, 0 = never) bounds staleness from other workers
+    def __init__(self, ttl: float = 0):
+        self.ttl = ttl
+        self._provinces = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        if self._provinces is None:
+            return False
+        return not self.ttl or time.monotonic() - self._loaded_at < self.ttl
+
+    async def load(self, db: Database):
+        await db.cursor.execute("SELECT * FROM provinces")
+        self._provinces = {row["id"]: row for row in await db.cursor.fetchall()}
+        self._loaded_at = time.monotonic()
+
+    #best effort - if MySQL is unavailable the cache simply loads on first use
+    async def warm(self):
+        try:
+            conn = await pool.acquire()
+            try:
+                db = await Database.open(conn)
+                await self.load(db)
+                await db.close()
+            finally:
+                await pool.release(conn)
+
+        except Exception as e:
+            print(f"Province cache warm-up failed: {e}")
+
+    async def _ensure_loaded(self, db: Database):
+        if not self._fresh():
+            async with self._lock:
+                if not self._fresh():
+                    await self.load(db)
+
+    async def get_many(self, ids, db: Database) -> dict:
+        await self._ensure_loaded(db)
+
+        found = {id: self._provinces[id] for id in set(ids) if id in self._provinces}
+        missing = [id for id in set(ids) if id not in found]
+
+        #ids created by another worker since the last load
+        if missing:
+            await db.cursor.execute(f"SELECT * FROM provinces WHERE id IN ({', '.join(['%s'] * len(missing))})", tuple(missing))
+            for row in await db.cursor.fetchall():
+                self._provinces[row["id"]] = row
+                found[row["id"]] = row
+
+        return found
+
+    async def get(self, province_id: int, db: Database):
+        return (await self.get_many([province_id], db)).get(province_id)
+
+    def put(self, province):
+        if self._provinces is not None:
+            self._provinces[province["id"]] = province
+
+    def remove(self, province_id: int):
+        if self._provinces is not None:
+            self._provinces.pop(province_id, None)
+
+    def invalidate(self):
+        self._provinces = None
+
+province_cache = ProvinceCache(ttl=settings.province_cache_ttl)
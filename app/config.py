@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -8,6 +9,28 @@ class Settings(BaseSettings):
     secret_key: str         
     algorithm: str          
     token_minutes: int      
+    database_pool_min: int = 2
+    database_pool_max: int = 20
+    database_pool_timeout: float = 5.0      #seconds to wait for a free connection
+    database_pool_ping: bool = True         #health check connections on checkout
+    database_replica_host: Optional[str] = None         #read replica for GET/HEAD requests (unset = everything on the primary)
+    database_replica_user: Optional[str] = None         #defaults to database_user
+    database_replica_password: Optional[str] = None     #defaults to database_password
+    database_replica_pool_max: int = 20
+    read_your_writes_seconds: float = 5     #reads stay on the primary this long after a client's own write
+    export_chunk_size: int = 500            #rows per chunk in the NDJSON export streams
+    import_chunk_size: int = 1000           #rows per executemany/transaction in the bulk imports
+    import_max_rows: int = 50000            #rows accepted per import request
+    idempotency_ttl: int = 86400            #seconds an Idempotency-Key and its stored response are kept
+    password_workers: int = 2               #bcrypt worker processes
+    password_queue_limit: int = 64          #queued + running password jobs before requests get a 503
+    password_batch_size: int = 8            #passwords hashed per job in the bulk imports (small, so logins interleave)
+    province_cache_ttl: float = 0           #seconds before the province cache reloads; set when running several workers
+    token_cache_enabled: bool = True        #reuse validated JWTs until they expire
+    token_cache_size: int = 10000           #validated tokens kept (least recently used are dropped first)
+    sql_log_requests: bool = True           #structured log line with query count/time per request
+    query_budget: int = 50                  #queries per request before a warning is logged (0 = off)
+    query_budgets: dict[str, int] = {}      #per-endpoint overrides, e.g. {"GET /doctors/{doctor_id}/patients/": 10}
     
     class Config:
         env_file = ".env"
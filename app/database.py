@@ -1,102 +1,196 @@
-import mysql.connector
-from mysql.connector import Error
-from mysql.connector.cursor import MySQLCursorDict      #returns dictionaries
+import asyncio
+import time
+from datetime import datetime
+import aiomysql
+from aiomysql import Error
+from fastapi import HTTPException, Request, status
 from .config import settings
+from .instrumentation import InstrumentedCursor, current_stats
 
-conn = mysql.connector.connect(
-    host=settings.database_host,
-    user=settings.database_user,
-    password=settings.database_password
-)
+#every connection works in UTC, so CURRENT_TIMESTAMP/ON UPDATE values and the app's datetime.utcnow() agree
+SESSION_TIME_ZONE = "SET time_zone = '+00:00'"
+
+def connect_args():
+    return dict(
+        host=settings.database_host,
+        user=settings.database_user,
+        password=settings.database_password,
+        db=settings.database_name,
+        init_command=SESSION_TIME_ZONE
+    )
 
-cursor = conn.cursor()
-cursor.execute("CREATE DATABASE IF NOT EXISTS admission")
-print("Database successfully created")
-conn.commit()
+#the replica shares the primary's credentials unless its own are set
+def replica_connect_args():
+    return dict(
+        host=settings.database_replica_host,
+        user=settings.database_replica_user or settings.database_user,
+        password=settings.database_replica_password or settings.database_password,
+        db=settings.database_name,
+        init_command=SESSION_TIME_ZONE
+    )
 
 class Database:
-    def __init__(self):
-        try:
-            self.conn = mysql.connector.connect(
-                host=settings.database_host,
-                user=settings.database_user,
-                password=settings.database_password,
-                database=settings.database_name,
-                use_pure=True
-            )
+    #wraps a single connection; use Database.open with one checked out from the pool, or Database.connect for a standalone one (scripts, DDL)
+    def __init__(self, conn, cursor):
+        self.conn = conn
+        self.cursor = cursor            #DictCursor (returns dictionaries), timed per request
 
-            self.cursor = self.conn.cursor(cursor_class=MySQLCursorDict, buffered=True)
+    @classmethod
+    async def open(cls, conn):
+        return cls(conn, InstrumentedCursor(await conn.cursor(aiomysql.DictCursor)))
 
+    @classmethod
+    async def connect(cls):
+        try:
+            conn = await aiomysql.connect(**connect_args())
         except Error as e:
             print(f"Database connection error: {e}")
             raise
 
-    def create_tables(self):
-        commands = (
-            """
-            CREATE TABLE IF NOT EXISTS provinces(
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                name VARCHAR(60) NOT NULL,
-                city VARCHAR(60) NOT NULL,
-
-                UNIQUE (name, city)
-                );
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS patients(
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                province_id INT NOT NULL,
-                first_name VARCHAR(30) NOT NULL,
-                last_name VARCHAR(30) NOT NULL,
-                email VARCHAR(64) NOT NULL,
-                password VARCHAR(120) NOT NULL,
-                gender VARCHAR(16),
-                birth_date DATE NOT NULL,
-                allergies VARCHAR(80),
-                height_cm FLOAT NOT NULL,
-                weight_kg FLOAT NOT NULL,
-
-                UNIQUE (email),
-                FOREIGN KEY (province_id) REFERENCES provinces (id)
-                ON UPDATE CASCADE ON DELETE CASCADE
-                );
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS doctors (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                first_name VARCHAR(30) NOT NULL,
-                last_name VARCHAR(30) NOT NULL,
-                email VARCHAR(64) NOT NULL,
-                password VARCHAR(120) NOT NULL,
-                specialty VARCHAR(30) NOT NULL,
-
-                UNIQUE (email)
-            );
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS admissions (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                patient_id INT NOT NULL,
-                doctor_id INT NOT NULL,
-                diagnosis VARCHAR(80) NOT NULL,
-                status VARCHAR(10) NOT NULL DEFAULT 'sick',
-                admission_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                discharge_date TIMESTAMP DEFAULT NULL,
-                
-                FOREIGN KEY (patient_id) REFERENCES patients (id)
-                ON UPDATE CASCADE ON DELETE CASCADE,
-                FOREIGN KEY (doctor_id) REFERENCES doctors (id)
-                ON UPDATE CASCADE ON DELETE CASCADE
-            );
-            """
+        return await cls.open(conn)
+
+    async def close(self):
+        await self.cursor.close()
+
+
+class PoolTimeout(Exception):
+    pass
+
+class ConnectionPool:
+    #asyncio pool: keeps at least min_size connections open, grows up to max_size,
+    #and waits up to timeout seconds for a connection to be released when exhausted
+    def __init__(self, min_size: int, max_size: int, timeout: float, ping: bool = True, connect=connect_args):
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.ping = ping
+
+        self._pool = None
+        self._lock = asyncio.Lock()
+
+    #the underlying pool is created on first checkout, so importing or starting the app never touches MySQL
+    async def open(self):
+        async with self._lock:
+            if self._pool is None:
+                self._pool = await aiomysql.create_pool(minsize=self.min_size, maxsize=self.max_size, **self.connect())
+
+    async def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+
+    async def acquire(self):
+        if self._pool is None:
+            await self.open()
+
+        try:
+            conn = await asyncio.wait_for(self._pool.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeout(f"No database connection available after {self.timeout}s")
+
+        #health check on checkout - reconnect connections the server has dropped
+        if self.ping:
+            try:
+                await conn.ping(reconnect=True)
+            except Error:
+                conn.close()
+                self._pool.release(conn)
+                raise
+
+        return conn
+
+    async def release(self, conn):
+        try:
+            await conn.rollback()       #drop anything the request left uncommitted
+        except Error:
+            conn.close()                #closed connections are discarded by the pool
+
+        self._pool.release(conn)
+
+
+pool = ConnectionPool(
+    min_size=settings.database_pool_min,
+    max_size=settings.database_pool_max,
+    timeout=settings.database_pool_timeout,
+    ping=settings.database_pool_ping
+)
+
+#optional read replica - only created when DATABASE_REPLICA_HOST is set
+replica_pool = ConnectionPool(
+    min_size=settings.database_pool_min,
+    max_size=settings.database_replica_pool_max,
+    timeout=settings.database_pool_timeout,
+    ping=settings.database_pool_ping,
+    connect=replica_connect_args
+) if settings.database_replica_host else None
+
+#read-your-writes: after a client's own successful write, its reads stay on the primary for a short window
+#(main.py sets the cookie) so it never reads a replica that has not caught up yet
+PRIMARY_COOKIE = "db_primary_until"
+READ_METHODS = ("GET", "HEAD")
+
+def sticky_until(seconds: float) -> str:
+    return f"{time.time() + seconds:.0f}"
+
+def is_sticky(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+def pool_for(request: Request):
+    #GET/HEAD handlers are read-only, so they go to the replica unless the client just wrote; everything else uses the primary
+    if replica_pool is not None and request.method in READ_METHODS and not is_sticky(request):
+        return replica_pool
+    return pool
+
+def read_pool():
+    #for reads that do not come from a client request (exports)
+    return replica_pool or pool
+
+#per-request connection dependency
+async def get_db(request: Request):
+    selected = pool_for(request)
+    try:
+        conn = await selected.acquire()
+    except PoolTimeout:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database is busy, please try again"
         )
 
-        for command in commands:
-            self.cursor.execute(command)
+    stats = current_stats.get()
+    if stats is not None:
+        stats.database = "replica" if selected is replica_pool else "primary"
+
+    db = await Database.open(conn)
+    try:
+        yield db
+    finally:
+        await db.close()
+        await selected.release(conn)
+
+
+#defaults of the columns a response returns, pinned by the app so the inserted row is known without reading it back
+#(admission_date is a whole-second TIMESTAMP, so it is truncated here rather than rounded by MySQL)
+#updated_at is left to MySQL - no response returns it, and only the server clock may move it
+def server_defaults(table: str) -> dict:
+    if table == "admissions":
+        return {"status": "sick", "admission_date": datetime.utcnow().replace(microsecond=0), "discharge_date": None}
+
+    return {}
+
+async def insert_row(db: Database, table: str, values: dict) -> dict:
+    #inserts one row and returns it as stored, with the id from cursor.lastrowid - no SELECT ... LAST_INSERT_ID() round trip
+    #None for a column that has a server default means "use the default"; nothing is committed here
+    defaults = server_defaults(table)
+    row = {**defaults, **{column: value for column, value in values.items() if value is not None or column not in defaults}}
 
-        print("Database connected successfully")
-        self.conn.commit()
-        self.conn.close()
+    await db.cursor.execute(
+        f"INSERT INTO {table} ({', '.join(row)}) VALUES ({', '.join(['%s'] * len(row))})",
+        tuple(row.values())
+    )
 
-db = Database()
-db.create_tables()
\ No newline at end of file
+    return {"id": db.cursor.lastrowid, **row}
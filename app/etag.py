@@ -0,0 +1,55 @@
+import hashlib
+from typing import Optional
+from fastapi import Request, Response, status
+from .database import Database
+
+#weak ETags for the detail endpoints, built from the updated_at columns (migration 5) of every row in the graph
+#one aggregate query over indexed columns - a matching If-None-Match is answered with 304 before the graph is loaded;
+#requests without If-None-Match get the same tag from the graph read itself (relationships.load_patient_graph)
+#COUNT(a.id) is part of the version so removing an admission changes it too
+PATIENT_VERSION = """
+    SELECT p.updated_at AS patient, pr.updated_at AS province, MAX(a.updated_at) AS admissions, COUNT(a.id) AS admission_count, MAX(d.updated_at) AS doctors
+    FROM patients p
+    JOIN provinces pr ON pr.id = p.province_id
+    LEFT JOIN admissions a ON a.patient_id = p.id
+    LEFT JOIN doctors d ON d.id = a.doctor_id
+    WHERE p.id = %s
+    GROUP BY p.id, pr.id
+"""
+
+DOCTOR_VERSION = """
+    SELECT d.updated_at AS doctor, MAX(a.updated_at) AS admissions, COUNT(a.id) AS admission_count, MAX(p.updated_at) AS patients
+    FROM doctors d
+    LEFT JOIN admissions a ON a.doctor_id = d.id
+    LEFT JOIN patients p ON p.id = a.patient_id
+    WHERE d.id = %s
+    GROUP BY d.id
+"""
+
+def make_etag(request: Request, *parts) -> str:
+    #the query string is part of the tag so ?fields=/?include= variants never share one
+    digest = hashlib.sha1("|".join(map(str, (*parts, request.url.query))).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+async def version_etag(request: Request, db: Database, sql: str, id: int) -> Optional[str]:
+    #None when the parent row does not exist
+    await db.cursor.execute(sql, (id,))
+    version = await db.cursor.fetchone()
+    if not version:
+        return None
+
+    return make_etag(request, id, *version.values())
+
+def not_modified(request: Request, etag: str) -> bool:
+    #weak comparison - W/ prefixes are ignored on both sides
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+
+    if header.strip() == "*":
+        return True
+
+    return etag.removeprefix("W/") in {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
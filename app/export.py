@@ -0,0 +1,85 @@
+import aiomysql
+import anyio
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from .database import Database, PoolTimeout, read_pool
+from .config import settings
+
+#streams a whole table as newline-delimited JSON, one relationship graph per line
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+class Export:
+    #one export's two pooled connections - rows stream on one, relationships are loaded on the other
+    def __init__(self, source, stream_conn, graph_conn, table: str, loader, model, chunk_size: int):
+        self.source = source
+        self.stream_conn = stream_conn
+        self.graph_conn = graph_conn
+        self.table = table
+        self.loader = loader
+        self.model = model
+        self.chunk_size = chunk_size
+        self.stream_cursor = None
+        self.db = None
+        self.finished = False
+        self.released = False
+
+    async def stream(self):
+        #unbuffered server-side cursor - rows are read from the server as we go instead of all at once
+        self.stream_cursor = await self.stream_conn.cursor(aiomysql.SSDictCursor)
+        self.db = await Database.open(self.graph_conn)
+        await self.stream_cursor.execute(f"SELECT * FROM {self.table} ORDER BY id")
+
+        while True:
+            rows = await self.stream_cursor.fetchmany(self.chunk_size)
+            if not rows:
+                break
+
+            #relationships are assembled per chunk on the second connection
+            yield "".join(self.model(**graph).model_dump_json() + "\n" for graph in await self.loader(rows, self.db))
+
+        self.finished = True
+
+    async def release(self):
+        if self.released:
+            return
+        self.released = True
+
+        if self.finished:
+            await self.stream_cursor.close()
+        else:
+            self.stream_conn.close()    #the stream stopped early; drop the connection instead of draining the result
+
+        if self.db is not None:
+            await self.db.close()
+        await self.source.release(self.graph_conn)
+        await self.source.release(self.stream_conn)
+
+class ExportResponse(StreamingResponse):
+    #the connections go back to the pool however the response ends - finished, the client disconnected (Starlette
+    #cancels the response task, and every await in the cleanup would be cancelled again without the shield) or failed
+    #before the first chunk, when the generator never started and its own cleanup could not run
+    def __init__(self, export: Export):
+        self.export = export
+        super().__init__(export.stream(), media_type=NDJSON_MEDIA_TYPE)
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                await self.export.release()
+
+async def ndjson_export(table: str, loader, model, chunk_size: int = None):
+    source = read_pool()
+    try:
+        stream_conn = await source.acquire()
+    except PoolTimeout:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Database is busy, please try again")
+
+    try:
+        graph_conn = await source.acquire()
+    except PoolTimeout:
+        await source.release(stream_conn)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Database is busy, please try again")
+
+    return ExportResponse(Export(source, stream_conn, graph_conn, table, loader, model, chunk_size or settings.export_chunk_size))
@@ -0,0 +1,41 @@
+from typing import Optional
+from fastapi import HTTPException, status
+from .relationships import DOCTOR_COLUMNS, PATIENT_COLUMNS
+
+#sparse fieldsets (?fields=id,first_name) and opt-in relationships (?include=admissions.doctor)
+#without either parameter the endpoints return the full default graph, as before
+PATIENT_RELATIONSHIPS = ("province", "admissions", "admissions.doctor")
+DOCTOR_RELATIONSHIPS = ("admissions", "admissions.patient")
+
+def parse_names(value: str, allowed, parameter: str) -> list:
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown {parameter}: {', '.join(unknown)} (allowed: {', '.join(allowed)})"
+        )
+
+    return names
+
+def fieldset(fields: Optional[str], include: Optional[str], columns, relationships):
+    #returns None for the default graph, otherwise (fields, include) - id is always returned and a nested
+    #relationship brings its parent with it (admissions.doctor implies admissions)
+    if fields is None and include is None:
+        return None
+
+    selected = tuple(dict.fromkeys(["id", *parse_names(fields, columns, "fields")])) if fields else tuple(columns)
+    included = set(parse_names(include, relationships, "include")) if include else set()
+    included |= {name.split(".")[0] for name in included}
+
+    return selected, included
+
+def patient_fieldset(fields: Optional[str], include: Optional[str]):
+    return fieldset(fields, include, PATIENT_COLUMNS, PATIENT_RELATIONSHIPS)
+
+def doctor_fieldset(fields: Optional[str], include: Optional[str]):
+    return fieldset(fields, include, DOCTOR_COLUMNS, DOCTOR_RELATIONSHIPS)
+
+def patient_select(fields, include) -> tuple:
+    #columns to read from patients - the requested fields plus the keys the included relationships join on
+    return tuple(dict.fromkeys([*fields, *(["province_id"] if "province" in include else [])]))
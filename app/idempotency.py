@@ -0,0 +1,121 @@
+import asyncio
+import hashlib
+import hmac
+from typing import Optional
+import aiomysql
+from fastapi import HTTPException, Request, Response, status
+from .database import Database, pool
+from .config import settings
+
+#Idempotency-Key support for the create endpoints - a retried POST with the same key and body gets the stored response
+#back without running the insert, the password hashing or the relationship loading again
+#the key is reserved before the create runs and the response is stored in the same transaction, so a key is only ever
+#kept for a committed create; a concurrent retry blocks on the reservation (before its own insert or password hash),
+#fails with a duplicate once the first request commits and replays that response instead
+#only successful responses are stored - a request that failed can be retried with the same key
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+class Idempotency:
+    def __init__(self, scope: str, key: Optional[str], fingerprint: str):
+        #scope - method and path, so one key cannot replay a response from another endpoint or parent resource
+        self.scope = scope
+        self.key = key
+        self.fingerprint = fingerprint
+
+    async def replay(self, db: Database) -> Optional[Response]:
+        #the stored response for this key, None when the request has to run
+        if self.key is None:
+            return None
+
+        await db.cursor.execute(
+            "SELECT fingerprint, status_code, body, created_at < NOW(6) - INTERVAL %s SECOND AS expired FROM idempotency_keys WHERE scope = %s AND idempotency_key = %s",
+            (settings.idempotency_ttl, self.scope, self.key)
+        )
+        stored = await db.cursor.fetchone()
+        if not stored:
+            return None
+
+        #an expired key is free again; the delete commits with the new record
+        if stored["expired"]:
+            await db.cursor.execute("DELETE FROM idempotency_keys WHERE scope = %s AND idempotency_key = %s", (self.scope, self.key))
+            return None
+
+        if stored["fingerprint"] != self.fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"{IDEMPOTENCY_HEADER} was already used with a different request body"
+            )
+
+        return Response(
+            content=stored["body"],
+            status_code=stored["status_code"],
+            media_type="application/json",
+            headers={REPLAYED_HEADER: "true"}
+        )
+
+    async def reserve(self, db: Database) -> Optional[Response]:
+        #call before the create; returns the stored response when there is one, otherwise claims the key in the
+        #transaction the create will commit in (the placeholder row is never visible to other requests)
+        replayed = await self.replay(db)
+        if replayed or self.key is None:
+            return replayed
+
+        try:
+            await db.cursor.execute(
+                "INSERT INTO idempotency_keys (scope, idempotency_key, fingerprint, status_code, body) VALUES (%s, %s, %s, 0, '')",
+                (self.scope, self.key, self.fingerprint)
+            )
+        except aiomysql.IntegrityError:
+            #a concurrent request with the same key committed first - start over and replay its response
+            await db.conn.rollback()
+            return await self.reserve(db)
+
+        return None
+
+    async def save(self, db: Database, response: Response):
+        #call before the create commits
+        if self.key is None:
+            return
+
+        await db.cursor.execute(
+            "UPDATE idempotency_keys SET status_code = %s, body = %s WHERE scope = %s AND idempotency_key = %s",
+            (response.status_code, response.body, self.scope, self.key)
+        )
+
+#dependency for the create endpoints; without the header every method is a no-op
+async def idempotency(request: Request) -> Idempotency:
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is not None and not 0 < len(key) <= MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{IDEMPOTENCY_HEADER} must be 1 to {MAX_KEY_LENGTH} characters"
+        )
+
+    #keyed with the app secret - bodies carry plaintext passwords, and a bare hash could be brute-forced from the table
+    fingerprint = hmac.new(settings.secret_key.encode(), await request.body(), hashlib.sha256).hexdigest() if key is not None else ""
+    return Idempotency(f"{request.method} {request.url.path}", key, fingerprint)
+
+
+async def purge(db: Database) -> int:
+    await db.cursor.execute("DELETE FROM idempotency_keys WHERE created_at < NOW(6) - INTERVAL %s SECOND", (settings.idempotency_ttl,))
+    await db.conn.commit()
+    return db.cursor.rowcount
+
+#best effort, like the province cache warm-up - expired keys are also reclaimed one at a time by replay()
+async def purge_periodically():
+    while True:
+        try:
+            conn = await pool.acquire()
+            try:
+                db = await Database.open(conn)
+                await purge(db)
+                await db.close()
+            finally:
+                await pool.release(conn)
+
+        except Exception as e:
+            print(f"Idempotency key purge failed: {e}")
+
+        await asyncio.sleep(settings.idempotency_ttl)
@@ -0,0 +1,84 @@
+import contextvars
+import json
+import logging
+import time
+from .config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+#per-request SQL counters - the middleware in main.py starts a QueryStats per request,
+#every Database cursor records into whichever one is current
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_sql = None
+        self.database = None            #"primary" or "replica", set by get_db
+
+    def record(self, sql: str, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+
+        if elapsed_ms >= self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_sql = " ".join(sql.split())
+
+current_stats = contextvars.ContextVar("query_stats", default=None)
+
+class InstrumentedCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    async def _timed(self, method, sql, params):
+        started = time.perf_counter()
+        try:
+            return await method(sql, params)
+        finally:
+            stats = current_stats.get()
+            if stats is not None:
+                stats.record(sql, (time.perf_counter() - started) * 1000)
+
+    async def execute(self, sql, params=None):
+        return await self._timed(self._cursor.execute, sql, params)
+
+    async def executemany(self, sql, params):
+        return await self._timed(self._cursor.executemany, sql, params)
+
+
+def route_name(request) -> str:
+    route = request.scope.get("route")
+    return f"{request.method} {route.path if route else request.url.path}"
+
+def query_budget(name: str) -> int:
+    return settings.query_budgets.get(name, settings.query_budget)
+
+def report(request, response, stats: QueryStats, elapsed_ms: float):
+    name = route_name(request)
+
+    response.headers["Server-Timing"] = (
+        f'db;dur={stats.total_ms:.2f};desc="{stats.count} queries", '
+        f"db-slowest;dur={stats.slowest_ms:.2f}, "
+        f"total;dur={elapsed_ms:.2f}"
+    )
+
+    line = {
+        "route": name,
+        "status": response.status_code,
+        "database": stats.database,
+        "queries": stats.count,
+        "db_ms": round(stats.total_ms, 2),
+        "slowest_ms": round(stats.slowest_ms, 2),
+        "slowest_sql": stats.slowest_sql,
+        "total_ms": round(elapsed_ms, 2)
+    }
+
+    if settings.sql_log_requests:
+        logger.info(json.dumps(line))
+
+    budget = query_budget(name)
+    if budget and stats.count > budget:
+        logger.warning(json.dumps({**line, "event": "query_budget_exceeded", "budget": budget}))
@@ -1,8 +1,68 @@
-from fastapi import FastAPI
-from .database import Database
-from .routers import d_admissions, provinces, patients, doctors, relation, login, p_admissions
+import asyncio
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from .database import PRIMARY_COOKIE, READ_METHODS, pool, replica_pool, sticky_until
+from .config import settings
+from .cache import province_cache
+from .idempotency import purge_periodically
+from .instrumentation import QueryStats, current_stats, report
+from .routers import d_admissions, provinces, patients, doctors, relation, login, p_admissions, metrics, admissions, stats
+from .utils import shutdown_password_pool
 
-app = FastAPI()
+started_at = time.perf_counter()
+logger = logging.getLogger("uvicorn.error")
+
+#no blocking database I/O at startup - the schema is bootstrapped by `python -m app.migrations upgrade`,
+#pooled connections are opened lazily and the province cache is warmed in the background
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_up = asyncio.create_task(province_cache.warm())
+    purge_keys = asyncio.create_task(purge_periodically())
+    logger.info(f"Application ready in {(time.perf_counter() - started_at) * 1000:.1f} ms (province cache warming in background)")
+    yield
+
+    warm_up.cancel()
+    purge_keys.cancel()
+    await pool.close()
+    if replica_pool is not None:
+        await replica_pool.close()
+    shutdown_password_pool()
+
+app = FastAPI(lifespan=lifespan)
+
+#query count, DB time and slowest statement per request - returned as Server-Timing and logged
+@app.middleware("http")
+async def sql_instrumentation(request: Request, call_next):
+    stats = QueryStats()
+    token = current_stats.set(stats)
+    started = time.perf_counter()
+
+    try:
+        response = await call_next(request)
+    finally:
+        current_stats.reset(token)
+
+    report(request, response, stats, (time.perf_counter() - started) * 1000)
+    return response
+
+#read-your-writes for the replica routing in database.py - a client that just wrote reads from the primary for a while
+@app.middleware("http")
+async def primary_after_write(request: Request, call_next):
+    response = await call_next(request)
+
+    if replica_pool is not None and request.method not in READ_METHODS and response.status_code < 400:
+        response.set_cookie(
+            PRIMARY_COOKIE,
+            sticky_until(settings.read_your_writes_seconds),
+            max_age=math.ceil(settings.read_your_writes_seconds),
+            httponly=True,
+            samesite="lax"
+        )
+
+    return response
 
 app.include_router(provinces.router)
 app.include_router(patients.router)
@@ -10,9 +70,7 @@ app.include_router(p_admissions.router)
 app.include_router(doctors.router)
 app.include_router(relation.router)
 app.include_router(d_admissions.router)
+app.include_router(admissions.router)
 app.include_router(login.router)
-
-@app.on_event("startup")
-def startup():
-    db = Database()
-    db.create_tables()
+app.include_router(metrics.router)
+app.include_router(stats.router)
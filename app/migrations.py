@@ -0,0 +1,224 @@
+import argparse
+import asyncio
+import sys
+import aiomysql
+from .database import Database
+from .config import settings
+from .stats import apply_statements
+
+#versioned schema migrations - applied in order and recorded in schema_version
+#MySQL commits DDL implicitly, so keep one logical change per migration
+MIGRATIONS = (
+    (1, "initial schema", (
+        """
+        CREATE TABLE IF NOT EXISTS provinces(
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(60) NOT NULL,
+            city VARCHAR(60) NOT NULL,
+
+            UNIQUE (name, city)
+            );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS patients(
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            province_id INT NOT NULL,
+            first_name VARCHAR(30) NOT NULL,
+            last_name VARCHAR(30) NOT NULL,
+            email VARCHAR(64) NOT NULL,
+            password VARCHAR(120) NOT NULL,
+            gender VARCHAR(16),
+            birth_date DATE NOT NULL,
+            allergies VARCHAR(80),
+            height_cm FLOAT NOT NULL,
+            weight_kg FLOAT NOT NULL,
+
+            UNIQUE (email),
+            FOREIGN KEY (province_id) REFERENCES provinces (id)
+            ON UPDATE CASCADE ON DELETE CASCADE
+            );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS doctors (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            first_name VARCHAR(30) NOT NULL,
+            last_name VARCHAR(30) NOT NULL,
+            email VARCHAR(64) NOT NULL,
+            password VARCHAR(120) NOT NULL,
+            specialty VARCHAR(30) NOT NULL,
+
+            UNIQUE (email)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS admissions (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            patient_id INT NOT NULL,
+            doctor_id INT NOT NULL,
+            diagnosis VARCHAR(80) NOT NULL,
+            status VARCHAR(10) NOT NULL DEFAULT 'sick',
+            admission_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            discharge_date TIMESTAMP DEFAULT NULL,
+            
+            FOREIGN KEY (patient_id) REFERENCES patients (id)
+            ON UPDATE CASCADE ON DELETE CASCADE,
+            FOREIGN KEY (doctor_id) REFERENCES doctors (id)
+            ON UPDATE CASCADE ON DELETE CASCADE
+        );
+        """
+    )),
+    (2, "admission indexes for doctor/patient lookups, status filters and date-range scans", (
+        "CREATE INDEX ix_admissions_doctor_patient_date ON admissions (doctor_id, patient_id, admission_date)",
+        "CREATE INDEX ix_admissions_patient_date ON admissions (patient_id, admission_date)",
+        "CREATE INDEX ix_admissions_status_date ON admissions (status, admission_date)",
+        "CREATE INDEX ix_admissions_admission_date ON admissions (admission_date)",
+        "CREATE INDEX ix_admissions_discharge_date ON admissions (discharge_date)"
+    )),
+    (3, "admission search indexes for doctor/status/date filters and diagnosis prefixes", (
+        "CREATE INDEX ix_admissions_doctor_status_date ON admissions (doctor_id, status, admission_date)",
+        "CREATE INDEX ix_admissions_diagnosis ON admissions (diagnosis)"
+    )),
+    (4, "patient search: full-text index on names/email and prefix indexes on the names", (
+        "CREATE FULLTEXT INDEX ft_patients_name_email ON patients (first_name, last_name, email)",
+        "CREATE INDEX ix_patients_last_first ON patients (last_name, first_name)",
+        "CREATE INDEX ix_patients_first_name ON patients (first_name)"
+    )),
+    (5, "updated_at row versions for ETags, with indexes so a graph's version is read from indexes only", (
+        "ALTER TABLE provinces ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)",
+        "ALTER TABLE patients ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)",
+        "ALTER TABLE doctors ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)",
+        "ALTER TABLE admissions ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)",
+        "CREATE INDEX ix_admissions_patient_updated ON admissions (patient_id, updated_at)",
+        "CREATE INDEX ix_admissions_doctor_updated ON admissions (doctor_id, updated_at)"
+    )),
+    (6, "census summary tables maintained by app/stats.py, filled from the existing admissions", (
+        """
+        CREATE TABLE IF NOT EXISTS doctor_census (
+            doctor_id INT PRIMARY KEY,
+            admissions INT NOT NULL DEFAULT 0,
+            sick INT NOT NULL DEFAULT 0,
+            discharged INT NOT NULL DEFAULT 0,
+            stay_seconds BIGINT NOT NULL DEFAULT 0,
+
+            FOREIGN KEY (doctor_id) REFERENCES doctors (id)
+            ON UPDATE CASCADE ON DELETE CASCADE
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS province_daily_admissions (
+            province_id INT NOT NULL,
+            day DATE NOT NULL,
+            admissions INT NOT NULL DEFAULT 0,
+
+            PRIMARY KEY (province_id, day),
+            INDEX ix_province_daily_day (day),
+            FOREIGN KEY (province_id) REFERENCES provinces (id)
+            ON UPDATE CASCADE ON DELETE CASCADE
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS census_totals (
+            id TINYINT PRIMARY KEY,
+            admissions BIGINT NOT NULL DEFAULT 0,
+            sick BIGINT NOT NULL DEFAULT 0,
+            discharged BIGINT NOT NULL DEFAULT 0,
+            stay_seconds BIGINT NOT NULL DEFAULT 0
+        );
+        """,
+        *apply_statements("TRUE", 1)
+    )),
+    (7, "idempotency keys with the stored response of each create (app/idempotency.py)", (
+        """
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            scope VARCHAR(255) NOT NULL,
+            idempotency_key VARCHAR(255) NOT NULL,
+            fingerprint CHAR(64) NOT NULL,
+            status_code SMALLINT NOT NULL,
+            body MEDIUMBLOB NOT NULL,
+            created_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+
+            PRIMARY KEY (scope, idempotency_key),
+            INDEX ix_idempotency_keys_created (created_at)
+        );
+        """
+    )),
+)
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+async def create_database():
+    conn = await aiomysql.connect(
+        host=settings.database_host,
+        user=settings.database_user,
+        password=settings.database_password
+    )
+
+    async with conn.cursor() as cursor:
+        await cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{settings.database_name}`")
+    print("Database successfully created")
+    await conn.commit()
+    conn.close()
+
+async def current_version(db: Database) -> int:
+    await db.cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            description VARCHAR(200) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    await db.cursor.execute("SELECT MAX(version) AS version FROM schema_version")
+    row = await db.cursor.fetchone()
+
+    return row["version"] or 0
+
+async def pending_migrations(db: Database):
+    version = await current_version(db)
+    return [migration for migration in MIGRATIONS if migration[0] > version]
+
+async def upgrade(db: Database):
+    applied = []
+
+    for version, description, statements in await pending_migrations(db):
+        for statement in statements:
+            await db.cursor.execute(statement)
+
+        await db.cursor.execute("INSERT INTO schema_version (version, description) VALUES (%s, %s)", (version, description))
+        await db.conn.commit()
+        print(f"Applied migration {version}: {description}")
+        applied.append(version)
+
+    return applied
+
+
+#one-shot schema bootstrap, run before starting the web workers: python -m app.migrations upgrade|check
+async def main(command: str) -> int:
+    if command == "upgrade":
+        await create_database()
+
+    db = await Database.connect()
+    try:
+        if command == "upgrade":
+            applied = await upgrade(db)
+            print(f"Schema is at version {LATEST_VERSION} ({len(applied)} migration(s) applied)")
+            return 0
+
+        version = await current_version(db)
+        pending = [migration[0] for migration in MIGRATIONS if migration[0] > version]
+        if pending:
+            print(f"Schema is at version {version}, pending: {', '.join(map(str, pending))}")
+            return 1
+
+        print(f"Schema is up to date (version {LATEST_VERSION})")
+        return 0
+
+    finally:
+        await db.close()
+        db.conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply or check database schema migrations")
+    parser.add_argument("command", choices=["upgrade", "check"])
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(main(args.command)))
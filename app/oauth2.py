@@ -1,3 +1,6 @@
+import hashlib
+import time
+from collections import OrderedDict
 from jose import JWTError, jwt
 from fastapi import Depends, status, HTTPException
 from datetime import datetime, timedelta
@@ -24,30 +27,92 @@ def create_token(data: dict):
 
     return encoded_jwt
 
+#validated tokens, so a polling client pays for the signature check once per token instead of once per request
+#bounded LRU keyed by the token's sha256; an entry is dropped once the token's exp has passed
+class TokenCache:
+    def __init__(self, size: int):
+        self.size = size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str):
+        key = self.key(token)
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.time():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, token: str, token_data: TokenData, expires_at: float):
+        key = self.key(token)
+        self._entries[key] = (token_data, expires_at)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": settings.token_cache_enabled,
+            "size": len(self._entries),
+            "max_size": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+token_cache = TokenCache(size=settings.token_cache_size)
+
+#credentials_exception is the HTTPException to raise, or a function that builds it (only called when the token is rejected)
 def verify_token(token, credentials_exception):
+    if settings.token_cache_enabled:
+        token_data = token_cache.get(token)
+        if token_data is not None:
+            return token_data
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
 
         id = payload.get("user_id")
 
         if not id:
-            raise credentials_exception
+            raise credentials_exception() if callable(credentials_exception) else credentials_exception
         
     except JWTError as e:
-        raise credentials_exception
+        raise credentials_exception() if callable(credentials_exception) else credentials_exception
     
-    return TokenData(id=id)
+    token_data = TokenData(id=id)
+    if settings.token_cache_enabled and payload.get("exp"):
+        token_cache.put(token, token_data, payload["exp"])
 
-def get_current_patient(token = Depends(patient_oauth2_scheme)):
-    credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
-                                          detail="Could not validate credentials",
-                                          headers={"WWW-Authenticate": "Bearer"})
-    
-    return verify_token(token, credentials_exception)
+    return token_data
 
-def get_current_doctor(token = Depends(doctor_oauth2_scheme)):
-    credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
-                                          detail="Could not validate credentails",
-                                          headers={"WWW-Authenticate": "Bearer"})
-    
-    return verify_token(token, credentials_exception)
\ No newline at end of file
+def patient_credentials_exception():
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+                         detail="Could not validate credentials",
+                         headers={"WWW-Authenticate": "Bearer"})
+
+def doctor_credentials_exception():
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+                         detail="Could not validate credentails",
+                         headers={"WWW-Authenticate": "Bearer"})
+
+async def get_current_patient(token = Depends(patient_oauth2_scheme)):
+    return verify_token(token, patient_credentials_exception)
+
+async def get_current_doctor(token = Depends(doctor_oauth2_scheme)):
+    return verify_token(token, doctor_credentials_exception)
\ No newline at end of file
@@ -0,0 +1,51 @@
+import base64
+import binascii
+from typing import Optional
+from fastapi import HTTPException, Response, status
+
+#keyset pagination on the id primary key - page cost stays the same no matter how deep the client reads
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+#kind is "id" for keyset pages, "offset" for ranked results (search) where there is no stable key to seek from
+def encode_cursor(last_id: int, kind: str = "id") -> str:
+    return base64.urlsafe_b64encode(f"{kind}:{last_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str], kind: str = "id") -> int:
+    if not cursor:
+        return 0
+
+    try:
+        cursor_kind, value = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split(":")
+        if cursor_kind != kind:
+            raise ValueError(cursor_kind)
+        if int(value) < 0:
+            raise ValueError(value)
+        return int(value)
+
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+#rows must be fetched with LIMIT limit + 1 so we know whether another page exists
+def page(rows, limit: int, response: Response, key: str = "id"):
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1][key])
+
+    return rows
+
+def offset_page(rows, offset: int, limit: int, response: Response):
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(offset + limit, "offset")
+
+    return rows
+
+async def keyset_page(db, table: str, after: Optional[str], limit: int, response: Response, columns="*"):
+    select = columns if isinstance(columns, str) else ", ".join(columns)
+    await db.cursor.execute(f"SELECT {select} FROM {table} WHERE id > %s ORDER BY id LIMIT %s", (decode_cursor(after), limit + 1))
+    return page(await db.cursor.fetchall(), limit, response)
@@ -1,59 +1,255 @@
 from .database import Database
+from .cache import province_cache
 
-def patient_relationship(patient, db: Database):
-    db.cursor.execute("SELECT * FROM provinces WHERE id = %s", (patient["province_id"],))
-    province = db.cursor.fetchone()
+#batched loaders - a fixed number of IN (...) queries per page of parents instead of one query per row
+def placeholders(ids) -> str:
+    return ", ".join(["%s"] * len(ids))
 
-    db.cursor.execute("SELECT * FROM admissions WHERE patient_id = %s", (patient["id"],))
-    admissions = db.cursor.fetchall()
-    
-    new_admissions = []
-    for admission in admissions:
-        db.cursor.execute("SELECT * FROM doctors WHERE id = %s", (admission["doctor_id"],))
-        doctor = db.cursor.fetchone()
+def select_list(columns) -> str:
+    return columns if isinstance(columns, str) else ", ".join(columns)
 
-        new_admissions.append({
-            **admission,
-            "doctor": doctor
-        })
+async def fetch_by_ids(db: Database, table: str, ids, columns="*") -> dict:
+    ids = list(set(ids))
+    if not ids:
+        return {}
 
-    return {
-        **patient,
-        "province": province,
-        "admissions": new_admissions
-    } 
+    await db.cursor.execute(f"SELECT {select_list(columns)} FROM {table} WHERE id IN ({placeholders(ids)})", tuple(ids))
+    return {row["id"]: row for row in await db.cursor.fetchall()}
+
+async def fetch_grouped(db: Database, table: str, column: str, ids, columns="*") -> dict:
+    ids = list(set(ids))
+    grouped = {id: [] for id in ids}
+    if not ids:
+        return grouped
+
+    await db.cursor.execute(f"SELECT {select_list(columns)} FROM {table} WHERE {column} IN ({placeholders(ids)})", tuple(ids))
+    for row in await db.cursor.fetchall():
+        grouped[row[column]].append(row)
+
+    return grouped
+
+
+#fields/include come from fieldsets.py; when include is given only those relationships are queried, with whitelisted
+#columns, and only the requested fields are returned - the result is ready to encode without a response model
+async def load_patient_graphs(patients, db: Database, fields=None, include=None):
+    if include is not None:
+        return await load_patient_fieldsets(patients, db, fields, include)
+
+    provinces = await province_cache.get_many([patient["province_id"] for patient in patients], db)
+    admissions = await fetch_grouped(db, "admissions", "patient_id", [patient["id"] for patient in patients])
+    doctors = await fetch_by_ids(db, "doctors", [admission["doctor_id"] for rows in admissions.values() for admission in rows])
+
+    return [
+        {
+            **patient,
+            "province": provinces.get(patient["province_id"]),
+            "admissions": [
+                {**admission, "doctor": doctors.get(admission["doctor_id"])}
+                for admission in admissions[patient["id"]]
+            ]
+        }
+        for patient in patients
+    ]
+
+async def load_patient_fieldsets(patients, db: Database, fields, include):
+    provinces, admissions, doctors = {}, {}, {}
+    if "province" in include:
+        provinces = await province_cache.get_many([patient["province_id"] for patient in patients], db)
+    if "admissions" in include:
+        admissions = await fetch_grouped(db, "admissions", "patient_id", [patient["id"] for patient in patients], ADMISSION_COLUMNS)
+    if "admissions.doctor" in include:
+        doctors = await fetch_by_ids(db, "doctors", [admission["doctor_id"] for rows in admissions.values() for admission in rows], DOCTOR_COLUMNS)
 
+    graphs = []
+    for patient in patients:
+        graph = {field: patient[field] for field in fields}
+        if "province" in include:
+            #cached rows are SELECT * (with updated_at for the ETags) - only the whitelisted columns are returned
+            province = provinces.get(patient["province_id"])
+            graph["province"] = {column: province[column] for column in PROVINCE_COLUMNS} if province else None
+        if "admissions" in include:
+            graph["admissions"] = [
+                {**admission, "doctor": doctors.get(admission["doctor_id"])} if "admissions.doctor" in include else admission
+                for admission in admissions[patient["id"]]
+            ]
+        graphs.append(graph)
 
-def doctor_relationship(doctor, db: Database):
-    db.cursor.execute("SELECT * FROM admissions WHERE doctor_id = %s", (doctor["id"],))
-    admissions = db.cursor.fetchall()
+    return graphs
 
-    new_admissions = []
+async def load_doctor_graphs(doctors, db: Database, fields=None, include=None):
+    if include is not None:
+        return await load_doctor_fieldsets(doctors, db, fields, include)
 
-    for admission in admissions:
-        db.cursor.execute("SELECT * FROM patients WHERE id = %s", (admission["patient_id"],))
-        patient = db.cursor.fetchone()
+    admissions = await fetch_grouped(db, "admissions", "doctor_id", [doctor["id"] for doctor in doctors])
+    patients = await fetch_by_ids(db, "patients", [admission["patient_id"] for rows in admissions.values() for admission in rows])
 
-        new_admissions.append({
+    return [
+        {
+            **doctor,
+            "admissions": [
+                {**admission, "patient": patients.get(admission["patient_id"])}
+                for admission in admissions[doctor["id"]]
+            ]
+        }
+        for doctor in doctors
+    ]
+
+async def load_doctor_fieldsets(doctors, db: Database, fields, include):
+    admissions, patients = {}, {}
+    if "admissions" in include:
+        admissions = await fetch_grouped(db, "admissions", "doctor_id", [doctor["id"] for doctor in doctors], ADMISSION_COLUMNS)
+    if "admissions.patient" in include:
+        patients = await fetch_by_ids(db, "patients", [admission["patient_id"] for rows in admissions.values() for admission in rows], PATIENT_COLUMNS)
+
+    graphs = []
+    for doctor in doctors:
+        graph = {field: doctor[field] for field in fields}
+        if "admissions" in include:
+            graph["admissions"] = [
+                {**admission, "patient": patients.get(admission["patient_id"])} if "admissions.patient" in include else admission
+                for admission in admissions[doctor["id"]]
+            ]
+        graphs.append(graph)
+
+    return graphs
+
+async def load_admission_graphs(admissions, db: Database):
+    patients = await fetch_by_ids(db, "patients", [admission["patient_id"] for admission in admissions])
+    doctors = await fetch_by_ids(db, "doctors", [admission["doctor_id"] for admission in admissions])
+
+    return [
+        {
             **admission,
-            "patient": patient
-        })
+            "patient": patients.get(admission["patient_id"]),
+            "doctor": doctors.get(admission["doctor_id"])
+        }
+        for admission in admissions
+    ]
 
-    return {
-        **doctor,
-        "admissions": new_admissions
+
+#single-statement graph reads for the detail endpoints - one JOIN, folded into the nested shape in Python
+PROVINCE_COLUMNS = ("id", "name", "city")
+PATIENT_COLUMNS = ("id", "province_id", "first_name", "last_name", "email", "gender", "birth_date", "allergies", "height_cm", "weight_kg")
+DOCTOR_COLUMNS = ("id", "first_name", "last_name", "email", "specialty")
+ADMISSION_COLUMNS = ("id", "patient_id", "doctor_id", "diagnosis", "status", "admission_date", "discharge_date")
+
+def aliased(alias: str, columns) -> str:
+    return ", ".join(f"{alias}.{column} AS {alias}__{column}" for column in columns)
+
+def unalias(row, alias: str, columns) -> dict:
+    return {column: row[f"{alias}__{column}"] for column in columns}
+
+#the graph reads also select every updated_at, so the detail endpoints build their ETag from the same round trip;
+#the version tuples match what etag.PATIENT_VERSION / DOCTOR_VERSION return for the same rows
+VERSION_COLUMNS = ("updated_at",)
+
+def latest(rows, column: str):
+    values = [row[column] for row in rows if row[column] is not None]
+    return max(values) if values else None
+
+def admission_count(rows) -> int:
+    return sum(1 for row in rows if row["a__id"] is not None)
+
+async def load_patient_graph(patient_id: int, db: Database):
+    #returns (graph, version), or (None, None) when the patient does not exist
+    await db.cursor.execute(f"""
+        SELECT {aliased("p", PATIENT_COLUMNS + VERSION_COLUMNS)}, {aliased("pr", PROVINCE_COLUMNS + VERSION_COLUMNS)},
+            {aliased("a", ADMISSION_COLUMNS + VERSION_COLUMNS)}, {aliased("d", DOCTOR_COLUMNS + VERSION_COLUMNS)}
+        FROM patients p
+        JOIN provinces pr ON pr.id = p.province_id
+        LEFT JOIN admissions a ON a.patient_id = p.id
+        LEFT JOIN doctors d ON d.id = a.doctor_id
+        WHERE p.id = %s
+        ORDER BY a.id
+        """, (patient_id,)
+    )
+    rows = await db.cursor.fetchall()
+    if not rows:
+        return None, None
+
+    graph = {
+        **unalias(rows[0], "p", PATIENT_COLUMNS),
+        "province": unalias(rows[0], "pr", PROVINCE_COLUMNS),
+        "admissions": [
+            {**unalias(row, "a", ADMISSION_COLUMNS), "doctor": unalias(row, "d", DOCTOR_COLUMNS)}
+            for row in rows if row["a__id"] is not None
+        ]
+    }
+    version = (rows[0]["p__updated_at"], rows[0]["pr__updated_at"], latest(rows, "a__updated_at"), admission_count(rows), latest(rows, "d__updated_at"))
+
+    return graph, version
+
+async def load_doctor_graph(doctor_id: int, db: Database):
+    #returns (graph, version), or (None, None) when the doctor does not exist
+    await db.cursor.execute(f"""
+        SELECT {aliased("d", DOCTOR_COLUMNS + VERSION_COLUMNS)}, {aliased("a", ADMISSION_COLUMNS + VERSION_COLUMNS)}, {aliased("p", PATIENT_COLUMNS + VERSION_COLUMNS)}
+        FROM doctors d
+        LEFT JOIN admissions a ON a.doctor_id = d.id
+        LEFT JOIN patients p ON p.id = a.patient_id
+        WHERE d.id = %s
+        ORDER BY a.id
+        """, (doctor_id,)
+    )
+    rows = await db.cursor.fetchall()
+    if not rows:
+        return None, None
+
+    graph = {
+        **unalias(rows[0], "d", DOCTOR_COLUMNS),
+        "admissions": [
+            {**unalias(row, "a", ADMISSION_COLUMNS), "patient": unalias(row, "p", PATIENT_COLUMNS)}
+            for row in rows if row["a__id"] is not None
+        ]
     }
+    version = (rows[0]["d__updated_at"], latest(rows, "a__updated_at"), admission_count(rows), latest(rows, "p__updated_at"))
 
+    return graph, version
 
-def admission_relationship(admission, db: Database):
-    db.cursor.execute("SELECT * FROM patients WHERE id = %s", (admission["patient_id"],))
-    patient = db.cursor.fetchone()
 
-    db.cursor.execute("SELECT * FROM doctors WHERE id = %s", (admission["doctor_id"],))
-    doctor = db.cursor.fetchone()
+async def load_admission_access(doctor_id: int, patient_id: int, db: Database, admission_id: int = None, for_update: bool = False):
+    #existence and ownership in one statement: no row means no patient (404), a row without admissions
+    #means the doctor is not assigned to the patient (403)
+    #for_update - the mutation paths lock the rows read here until they commit, so concurrent writes to one admission
+    #are serialized and each computes its census delta from the row it actually changes
+    admission_filter = "AND a.id = %s" if admission_id is not None else ""
+    lock = "FOR UPDATE" if for_update else ""
+    params = (doctor_id, admission_id, patient_id) if admission_id is not None else (doctor_id, patient_id)
+
+    await db.cursor.execute(f"""
+        SELECT {aliased("p", PATIENT_COLUMNS)}, {aliased("d", DOCTOR_COLUMNS)}, {aliased("a", ADMISSION_COLUMNS)}
+        FROM patients p
+        LEFT JOIN doctors d ON d.id = %s
+        LEFT JOIN admissions a ON a.patient_id = p.id AND a.doctor_id = d.id {admission_filter}
+        WHERE p.id = %s
+        ORDER BY a.id
+        {lock}
+        """, params
+    )
+    rows = await db.cursor.fetchall()
+    if not rows:
+        return None
+
+    patient = unalias(rows[0], "p", PATIENT_COLUMNS)
+    doctor = unalias(rows[0], "d", DOCTOR_COLUMNS) if rows[0]["d__id"] is not None else None
 
     return {
-        **admission,
         "patient": patient,
-        "doctor": doctor
-    } 
+        "doctor": doctor,
+        "admissions": [
+            {**unalias(row, "a", ADMISSION_COLUMNS), "patient": patient, "doctor": doctor}
+            for row in rows if row["a__id"] is not None
+        ]
+    }
+
+
+#single-row helpers
+async def patient_relationship(patient, db: Database):
+    return (await load_patient_graphs([patient], db))[0]
+
+
+async def doctor_relationship(doctor, db: Database):
+    return (await load_doctor_graphs([doctor], db))[0]
+
+
+async def admission_relationship(admission, db: Database):
+    return (await load_admission_graphs([admission], db))[0]
@@ -1,6 +1,6 @@
 
 from pydantic import BaseModel, EmailStr, Field
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, Literal, List
 
 
@@ -92,5 +92,48 @@ class AdmissionResponse(BaseModel):
     doctor: BaseDoctorResponse
 
 class DoctorPatientDetailResponse(PatientResponse):
-    admission_id: int
+    admission_id: int                                                   #the doctor's latest admission of this patient
+    admission_ids: List[int] = Field(default_factory=list)              #every admission of this patient under the doctor
+    latest_status: Optional[Literal["sick", "healthy"]] = None
+
+#list-view columns for the patient search results
+class PatientSearchResponse(BaseModel):
+    id: int
+    first_name: str
+    last_name: str
+    email: EmailStr
+    birth_date: datetime
+
+class CountResponse(BaseModel):
+    count: int
+
+#census counters (/stats)
+class DoctorCensusResponse(BaseModel):
+    doctor_id: int
+    admissions: int
+    sick: int
+    discharged: int
+    average_stay_hours: Optional[float] = None
+
+class ProvinceDailyAdmissionsResponse(BaseModel):
+    province_id: int
+    day: date
+    admissions: int
+
+class CensusResponse(BaseModel):
+    admissions: int
+    sick: int
+    discharged: int
+    average_stay_hours: Optional[float] = None
+
+#bulk imports
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+class ImportResponse(BaseModel):
+    received: int
+    imported: int
+    failed: int
+    errors: List[ImportRowError] = Field(default_factory=list)
 
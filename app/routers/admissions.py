@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends, Query, Response
+from typing import List, Literal, Optional
+from ..body import StoredDatetime, TokenData
+from ..response import AdmissionResponse, CountResponse
+from ..relationships import load_admission_graphs
+from ..database import Database, get_db
+from ..serialization import FastJSONResponse, forwarded_headers
+from ..pagination import DEFAULT_LIMIT, MAX_LIMIT, decode_cursor, page
+from ..oauth2 import get_current_doctor
+from ..search import like_prefix
+
+#admission search across doctors and patients (logged in doctors only)
+#every filter is optional and parameterized; the indexes from migration 3 cover the doctor/status/date and diagnosis filters
+router = APIRouter(
+    prefix="/admissions",
+    tags=["Admission Search"]
+)
+
+def search_filters(
+    status: Optional[Literal["sick", "healthy"]] = None,
+    doctor_id: Optional[int] = None,
+    patient_id: Optional[int] = None,
+    admitted_from: Optional[StoredDatetime] = None,
+    admitted_to: Optional[StoredDatetime] = None,
+    discharged_from: Optional[StoredDatetime] = None,
+    discharged_to: Optional[StoredDatetime] = None,
+    diagnosis: Optional[str] = Query(None, min_length=1, description="Diagnosis prefix, e.g. Dengue")
+) -> tuple[str, tuple]:
+    #returns the WHERE clause (without the keyword) and its values; date ranges are inclusive on both ends and, like the
+    #writes, converted to the naive UTC the columns hold (pymysql would otherwise drop an offset without converting)
+    conditions = [
+        ("doctor_id = %s", doctor_id),
+        ("patient_id = %s", patient_id),
+        ("status = %s", status),
+        ("admission_date >= %s", admitted_from),
+        ("admission_date <= %s", admitted_to),
+        ("discharge_date >= %s", discharged_from),
+        ("discharge_date <= %s", discharged_to),
+        ("diagnosis LIKE %s", like_prefix(diagnosis) if diagnosis else None)
+    ]
+    conditions = [(sql, value) for sql, value in conditions if value is not None]
+
+    where = " AND ".join(sql for sql, _ in conditions) or "TRUE"
+    return where, tuple(value for _, value in conditions)
+
+@router.get("/search", response_model=List[AdmissionResponse])
+async def search_admissions(response: Response, filters: tuple = Depends(search_filters), limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT), after: Optional[str] = None, current_doctor: TokenData = Depends(get_current_doctor), db: Database = Depends(get_db)):
+    where, values = filters
+    await db.cursor.execute(f"SELECT * FROM admissions WHERE {where} AND id > %s ORDER BY id LIMIT %s", values + (decode_cursor(after), limit + 1))
+    admissions = page(await db.cursor.fetchall(), limit, response)
+
+    return FastJSONResponse(await load_admission_graphs(admissions, db), model=List[AdmissionResponse], headers=forwarded_headers(response))
+
+#same filters, answered from the indexes without reading any admission rows into the app
+@router.get("/search/count", response_model=CountResponse)
+async def count_admissions(filters: tuple = Depends(search_filters), current_doctor: TokenData = Depends(get_current_doctor), db: Database = Depends(get_db)):
+    where, values = filters
+    await db.cursor.execute(f"SELECT COUNT(*) AS count FROM admissions WHERE {where}", values)
+    row = await db.cursor.fetchone()
+
+    return CountResponse(count=row["count"])
@@ -1,13 +1,16 @@
 from fastapi import APIRouter, status, HTTPException, Depends
-from ..body import DoctorAdmission, TokenData
+from ..body import DoctorAdmission, TokenData, stored_datetime
 from ..update import AdmissionPut, AdmissionPatch, dynamic_patch_query
 from ..response import AdmissionResponse
-from ..database import Database
+from ..database import Database, get_db, insert_row
+from ..serialization import FastJSONResponse
 from typing import List
 from datetime import datetime
 from ..oauth2 import get_current_doctor
-from ..relationships import admission_relationship
-from ..status_codes import validate_excluded_values, validate_logged_in_user, validate_doctor_admissions, validate_patient_exists
+from ..relationships import load_admission_access
+from ..idempotency import Idempotency, idempotency
+from .. import stats
+from ..status_codes import validate_excluded_values, validate_logged_in_user, validate_admission_access, validate_patient_exists
 
 #manages the admissions of patients (get all/by id, post, delete, put, patch)
 router = APIRouter(
@@ -15,83 +18,64 @@ router = APIRouter(
     tags=["Doctor Admission Requests"]
 )
 
-db = Database()
-
 @router.get("/", response_model=List[AdmissionResponse])
-def get_admissions(doctor_id: int, patient_id: int, current_doctor: TokenData = Depends(get_current_doctor)):
+async def get_admissions(doctor_id: int, patient_id: int, current_doctor: TokenData = Depends(get_current_doctor), db: Database = Depends(get_db)):
     validate_logged_in_user(doctor_id, current_doctor.id)
-    db.cursor.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
-    patient = db.cursor.fetchone()
-    validate_patient_exists(patient, patient_id)
-
     #if there are no patients that have the doctor_id logged in (the doctor does not handle that person)
-    db.cursor.execute("SELECT * FROM admissions WHERE patient_id = %s AND doctor_id = %s", (patient_id, current_doctor.id))
-    admissions = db.cursor.fetchall()
-    validate_doctor_admissions(admissions)
-
-    relationship_response = []
-    for admission in admissions:
-        new_admission = admission_relationship(admission, db)
-        relationship_response.append(AdmissionResponse(**new_admission))        #[AdmissionResponse(**row) for row in admissions] - before relationship implementation
+    access = await load_admission_access(current_doctor.id, patient_id, db)
+    validate_admission_access(access, patient_id)
 
-    return relationship_response
+    return FastJSONResponse(access["admissions"], model=List[AdmissionResponse])
 
 @router.post("/", response_model=AdmissionResponse, status_code=status.HTTP_201_CREATED)
-def create_admissions(doctor_id: int, patient_id: int, admission: DoctorAdmission, current_doctor: TokenData = Depends(get_current_doctor)):
+async def create_admissions(doctor_id: int, patient_id: int, admission: DoctorAdmission, key: Idempotency = Depends(idempotency), current_doctor: TokenData = Depends(get_current_doctor), db: Database = Depends(get_db)):
     try:
         validate_logged_in_user(doctor_id, current_doctor.id)
-        db.cursor.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
-        patient = db.cursor.fetchone()
-        validate_patient_exists(patient, patient_id)
+        replayed = await key.reserve(db)
+        if replayed:
+            return replayed
 
-        db.cursor.execute(
-            "INSERT INTO admissions (patient_id, doctor_id, diagnosis, status) VALUES (%s, %s, %s, %s)",
-            (patient_id, doctor_id, admission.diagnosis, admission.status))
-        db.conn.commit()
+        #creating does not require an existing assignment, only the patient (id 0 never matches an admission)
+        access = await load_admission_access(current_doctor.id, patient_id, db, admission_id=0)
+        validate_patient_exists(access, patient_id)
 
-        db.cursor.execute("SELECT * FROM admissions WHERE patient_id = %s AND doctor_id = %s ORDER BY admission_date DESC LIMIT 1", (patient_id, current_doctor.id))
-        admission = db.cursor.fetchone()
+        admission = await insert_row(db, "admissions", {"patient_id": patient_id, "doctor_id": doctor_id, **admission.dict()})
 
-        relationship_response = admission_relationship(admission, db)
+        await stats.record(db, added=[{**admission, "province_id": access["patient"]["province_id"]}])
+        response = FastJSONResponse({**admission, "patient": access["patient"], "doctor": access["doctor"]}, model=AdmissionResponse, status_code=status.HTTP_201_CREATED)
 
-        return AdmissionResponse(**relationship_response)
+        await key.save(db, response)
+        await db.conn.commit()
+
+        return response
     
     except HTTPException as http_exception:
         raise http_exception
     
     except Exception as e:
-        db.conn.rollback()
+        await db.conn.rollback()
         raise HTTPException(status_code=500, detail=f"{e}")
 
 @router.get("/{admission_id}", response_model=AdmissionResponse)
-def get_admission_by_id(doctor_id: int, patient_id: int, admission_id: int, current_doctor: TokenData = Depends(get_current_doctor)):
+async def get_admission_by_id(doctor_id: int, patient_id: int, admission_id: int, current_doctor: TokenData = Depends(get_current_doctor), db: Database = Depends(get_db)):
     validate_logged_in_user(doctor_id, current_doctor.id)
-    db.cursor.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
-    patient = db.cursor.fetchone()
-    validate_patient_exists(patient, patient_id)
-
-    db.cursor.execute("SELECT * FROM admissions WHERE id = %s AND patient_id = %s AND doctor_id = %s", (admission_id, patient_id, current_doctor.id))
-    admission = db.cursor.fetchone()
-    validate_doctor_admissions(admission)
-
-    relationship_response = admission_relationship(admission, db)
+    access = await load_admission_access(current_doctor.id, patient_id, db, admission_id)
+    validate_admission_access(access, patient_id)
 
-    return AdmissionResponse(**relationship_response)
+    return AdmissionResponse(**access["admissions"][0])
 
 @router.delete("/{admission_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_admission(doctor_id: int, patient_id: int, admission_id: int, current_doctor: TokenData = Depends(get_current_doctor)):
+async def delete_admission(doctor_id: int, patient_id: int, admission_id: int, current_doctor: TokenData = Depends(get_current_doctor), db: Database = Depends(get_db)):
     try:
         validate_logged_in_user(doctor_id, current_doctor.id)
-        db.cursor.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
-        patient = db.cursor.fetchone()
-        validate_patient_exists(patient, patient_id)
+        access = await load_admission_access(current_doctor.id, patient_id, db, admission_id, for_update=True)
+        validate_admission_access(access, patient_id)
 
-        db.cursor.execute("SELECT * FROM admissions WHERE id = %s AND patient_id = %s AND doctor_id = %s", (admission_id, patient_id, current_doctor.id))
-        admission = db.cursor.fetchone()
-        validate_doctor_admissions(admission)
-
-        db.cursor.execute("DELETE FROM admissions WHERE id = %s AND patient_id = %s AND doctor_id = %s", (admission_id, patient_id, current_doctor.id))
-        db.conn.commit()
+        await db.cursor.execute("DELETE FROM admissions WHERE id = %s AND patient_id = %s AND doctor_id = %s", (admission_id, patient_id, current_doctor.id))
+        #counters only move for a row this statement actually removed
+        if db.cursor.rowcount:
+            await stats.record(db, removed=[{**access["admissions"][0], "province_id": access["patient"]["province_id"]}])
+        await db.conn.commit()
 
         return
 
@@ -99,59 +83,60 @@ def delete_admission(doctor_id: int, patient_id: int, admission_id: int, current
         raise http_exception
     
     except Exception:
-        db.conn.rollback()
+        await db.conn.rollback()
         raise HTTPException(status_code=500, detail="Internal server error")
     
 
 @router.put("/{admission_id}", response_model=AdmissionResponse)
-def put_admission(doctor_id: int, patient_id: int, admission_id: int, admission: AdmissionPut, current_doctor: TokenData = Depends(get_current_doctor)):
+async def put_admission(doctor_id: int, patient_id: int, admission_id: int, admission: AdmissionPut, current_doctor: TokenData = Depends(get_current_doctor), db: Database = Depends(get_db)):
     try:
         validate_logged_in_user(doctor_id, current_doctor.id)
-        db.cursor.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
-        patient = db.cursor.fetchone()
-        validate_patient_exists(patient, patient_id)
-
-        db.cursor.execute("SELECT * FROM admissions WHERE id = %s AND patient_id = %s AND doctor_id = %s", (admission_id, patient_id, current_doctor.id))
-        existing_admission = db.cursor.fetchone()
-        validate_doctor_admissions(existing_admission)
+        access = await load_admission_access(current_doctor.id, patient_id, db, admission_id, for_update=True)
+        validate_admission_access(access, patient_id)
+        existing_admission = access["admissions"][0]
         
         if admission.status:
             if existing_admission["status"] == "healthy" and admission.status == "sick":
                 admission.discharge_date = None
             elif existing_admission["status"] == "sick" and admission.status == "healthy":
-                admission.discharge_date = datetime.utcnow()
+                admission.discharge_date = stored_datetime(datetime.utcnow())
 
-        db.cursor.execute(
+        await db.cursor.execute(
             "UPDATE admissions SET diagnosis = %s, status = %s, admission_date = %s, discharge_date = %s WHERE id = %s AND patient_id = %s AND doctor_id = %s",
             (admission.diagnosis, admission.status, admission.admission_date, admission.discharge_date, admission_id, patient_id, current_doctor.id))
-        db.conn.commit()
-        
-        db.cursor.execute("SELECT * FROM admissions WHERE id = %s AND patient_id = %s AND doctor_id = %s", (admission_id, patient_id, current_doctor.id))
-        updated_admission = db.cursor.fetchone()
 
-        relationship_response = admission_relationship(updated_admission, db)
+        #the row is already known - merge the written values instead of selecting it again
+        updated_admission = {
+            **existing_admission,
+            "diagnosis": admission.diagnosis,
+            "status": admission.status,
+            "admission_date": admission.admission_date,
+            "discharge_date": admission.discharge_date
+        }
 
-        return AdmissionResponse(**relationship_response)
+        #rowcount is 0 when nothing changed (MySQL reports changed rows), so there is no delta to record either
+        if db.cursor.rowcount:
+            province_id = access["patient"]["province_id"]
+            await stats.record(db, added=[{**updated_admission, "province_id": province_id}], removed=[{**existing_admission, "province_id": province_id}])
+        await db.conn.commit()
+
+        return AdmissionResponse(**updated_admission)
 
     except HTTPException as http_exception:
         raise http_exception
     
     except Exception as e:
-        db.conn.rollback()
+        await db.conn.rollback()
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @router.patch("/{admission_id}", response_model=AdmissionResponse)
-def patch_admission(doctor_id: int, patient_id: int, admission_id: int, admission: AdmissionPatch, current_doctor: TokenData = Depends(get_current_doctor)):
+async def patch_admission(doctor_id: int, patient_id: int, admission_id: int, admission: AdmissionPatch, current_doctor: TokenData = Depends(get_current_doctor), db: Database = Depends(get_db)):
     try:
         validate_logged_in_user(doctor_id, current_doctor.id)
-        db.cursor.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
-        patient = db.cursor.fetchone()
-        validate_patient_exists(patient, patient_id)
-
-        db.cursor.execute("SELECT * FROM admissions WHERE id = %s AND patient_id = %s AND doctor_id = %s", (admission_id, patient_id, current_doctor.id))
-        existing_admission = db.cursor.fetchone()
-        validate_doctor_admissions(existing_admission)
+        access = await load_admission_access(current_doctor.id, patient_id, db, admission_id, for_update=True)
+        validate_admission_access(access, patient_id)
+        existing_admission = access["admissions"][0]
 
         excluded_values = admission.dict(exclude_unset=True)
         validate_excluded_values(excluded_values)
@@ -161,21 +146,22 @@ def patch_admission(doctor_id: int, patient_id: int, admission_id: int, admissio
             if existing_admission["status"] == "healthy" and new_status == "sick":
                 excluded_values["discharge_date"] = None
             elif existing_admission["status"] == "sick" and new_status == "healthy":
-                excluded_values["discharge_date"] = datetime.utcnow()
+                excluded_values["discharge_date"] = stored_datetime(datetime.utcnow())
 
         sql, values = dynamic_patch_query("admissions", excluded_values, admission_id, patient_id=patient_id, doctor_id=current_doctor.id)
-        db.cursor.execute(sql, values)
-        db.conn.commit()
-
-        db.cursor.execute("SELECT * FROM admissions WHERE id = %s AND patient_id = %s AND doctor_id = %s", (admission_id, patient_id, current_doctor.id))
-        updated_admission = db.cursor.fetchone()
+        await db.cursor.execute(sql, values)
 
-        relationship_response = admission_relationship(updated_admission, db)
+        updated_admission = {**existing_admission, **excluded_values}
+        if db.cursor.rowcount:
+            province_id = access["patient"]["province_id"]
+            await stats.record(db, added=[{**updated_admission, "province_id": province_id}], removed=[{**existing_admission, "province_id": province_id}])
+        await db.conn.commit()
 
-        return AdmissionResponse(**relationship_response)
+        return AdmissionResponse(**updated_admission)
 
     except HTTPException as http_error:
         raise http_error
 
     except Exception as e:
+        await db.conn.rollback()
         raise HTTPException(status_code=500, detail=f"{e}")
\ No newline at end of file
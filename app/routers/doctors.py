@@ -1,12 +1,20 @@
-from fastapi import APIRouter, status, HTTPException, Depends
+from fastapi import APIRouter, status, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from ..body import Doctor, TokenData
 from ..response import DoctorResponse
 from ..update import DoctorsPatch, DoctorsPut, dynamic_patch_query
-from typing import List
-from ..database import Database
-from ..utils import hash
+from typing import List, Literal, Optional
+from ..export import NDJSON_MEDIA_TYPE, ndjson_export
+from ..pagination import DEFAULT_LIMIT, MAX_LIMIT, keyset_page
+from ..fieldsets import DOCTOR_RELATIONSHIPS, doctor_fieldset
+from ..etag import DOCTOR_VERSION, make_etag, not_modified, not_modified_response, version_etag
+from ..database import Database, get_db, insert_row
+from ..serialization import FastJSONResponse, forwarded_headers
+from ..utils import hash_async
+from ..idempotency import Idempotency, idempotency
 from ..oauth2 import get_current_doctor
-from ..relationships import doctor_relationship
+from .. import stats
+from ..relationships import DOCTOR_COLUMNS, doctor_relationship, load_doctor_graphs, load_doctor_graph
 from ..status_codes import validate_excluded_values, validate_doctor_exists, validate_logged_in_user
 
 #doctors requests (get all/by id, post, delete, put, patch)
@@ -15,63 +23,85 @@ router = APIRouter(
     tags=["Doctors"]
 )
 
-db = Database()
+FIELDS_QUERY = Query(None, description=f"Comma-separated doctor columns to return: {', '.join(DOCTOR_COLUMNS)}")
+INCLUDE_QUERY = Query(None, description=f"Comma-separated relationships to load: {', '.join(DOCTOR_RELATIONSHIPS)}. With fields or include set, only what is asked for is returned")
 
 @router.get("/", response_model=List[DoctorResponse])
-def get_doctors():
-    db.cursor.execute("SELECT * FROM doctors")
-    doctors = db.cursor.fetchall()
+async def get_doctors(response: Response, limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT), after: Optional[str] = None, fields: Optional[str] = FIELDS_QUERY, include: Optional[str] = INCLUDE_QUERY, db: Database = Depends(get_db)):
+    sparse = doctor_fieldset(fields, include)
+    if sparse:
+        selected, included = sparse
+        doctors = await keyset_page(db, "doctors", after, limit, response, selected)
+        return FastJSONResponse(await load_doctor_graphs(doctors, db, selected, included), trusted=True, headers=forwarded_headers(response))
 
-    relationship_response = []
+    doctors = await keyset_page(db, "doctors", after, limit, response)
 
-    for doctor in doctors:
-        new_doctor = doctor_relationship(doctor, db)
-        relationship_response.append(DoctorResponse(**new_doctor))
+    return FastJSONResponse(await load_doctor_graphs(doctors, db), model=List[DoctorResponse], headers=forwarded_headers(response))
 
-    return relationship_response
+#streams every doctor with their admissions and patients, one JSON document per line
+@router.get("/export", response_class=StreamingResponse, responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}})
+async def export_doctors(format: Literal["ndjson"] = "ndjson"):
+    return await ndjson_export("doctors", load_doctor_graphs, DoctorResponse)
 
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=DoctorResponse)
-def create_doctor(doctor: Doctor):
+async def create_doctor(doctor: Doctor, key: Idempotency = Depends(idempotency), db: Database = Depends(get_db)):
     try:
-        doctor.password = hash(doctor.password)
-        db.cursor.execute(
-            "INSERT INTO doctors (first_name, last_name, email, password, specialty) VALUES (%s, %s, %s, %s, %s)", 
-            (doctor.first_name, doctor.last_name, doctor.email, doctor.password, doctor.specialty)
-        )
-        db.conn.commit()
+        replayed = await key.reserve(db)
+        if replayed:
+            return replayed
 
-        db.cursor.execute("SELECT * FROM doctors WHERE id = LAST_INSERT_ID()")
-        created_doctor = db.cursor.fetchone()
-        
-        return DoctorResponse(**created_doctor)
+        doctor.password = await hash_async(doctor.password)
+        created_doctor = await insert_row(db, "doctors", doctor.dict())
+        response = FastJSONResponse(created_doctor, model=DoctorResponse, status_code=status.HTTP_201_CREATED)
+
+        await key.save(db, response)
+        await db.conn.commit()
+
+        return response
     
     except HTTPException as http_error:
         raise http_error
     
     except Exception:
-        db.conn.rollback()
+        await db.conn.rollback()
         raise HTTPException(status_code=500, detail=f"Internal server error")
 
 @router.get("/{doctor_id}", response_model=DoctorResponse)
-def get_doctor_by_id(doctor_id: int):
-    db.cursor.execute("SELECT * FROM doctors WHERE id = %s", (doctor_id,))
-    doctor = db.cursor.fetchone()
-    validate_doctor_exists(doctor, doctor_id)
+async def get_doctor_by_id(doctor_id: int, request: Request, response: Response, fields: Optional[str] = FIELDS_QUERY, include: Optional[str] = INCLUDE_QUERY, db: Database = Depends(get_db)):
+    sparse = doctor_fieldset(fields, include)
+
+    #same as the patient detail - the version query only when it can save the graph read, or for the sparse reads
+    if sparse or "if-none-match" in request.headers:
+        etag = await version_etag(request, db, DOCTOR_VERSION, doctor_id)
+        validate_doctor_exists(etag, doctor_id)
+        if not_modified(request, etag):
+            return not_modified_response(etag)
+
+    if sparse:
+        selected, included = sparse
+        await db.cursor.execute(f"SELECT {', '.join(selected)} FROM doctors WHERE id = %s", (doctor_id,))
+        doctor = await db.cursor.fetchone()
+        validate_doctor_exists(doctor, doctor_id)
+
+        return FastJSONResponse((await load_doctor_graphs([doctor], db, selected, included))[0], trusted=True, headers={"ETag": etag})
 
-    relationship_response = doctor_relationship(doctor, db)
+    relationship_response, version = await load_doctor_graph(doctor_id, db)
+    validate_doctor_exists(relationship_response, doctor_id)
 
+    response.headers["ETag"] = make_etag(request, doctor_id, *version)
     return DoctorResponse(**relationship_response)
 
 @router.delete("/{doctor_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_doctor(doctor_id: int, current_user: TokenData = Depends(get_current_doctor)):
+async def delete_doctor(doctor_id: int, current_user: TokenData = Depends(get_current_doctor), db: Database = Depends(get_db)):
     try:
         validate_logged_in_user(doctor_id, current_user.id)
-        db.cursor.execute("SELECT * FROM doctors WHERE id = %s", (doctor_id,))
-        doctor = db.cursor.fetchone()
+        await db.cursor.execute("SELECT * FROM doctors WHERE id = %s", (doctor_id,))
+        doctor = await db.cursor.fetchone()
         validate_doctor_exists(doctor, doctor_id)
         
-        db.cursor.execute("DELETE FROM doctors WHERE id = %s", (doctor_id,))
-        db.conn.commit()
+        await stats.remove_doctor(db, doctor_id)
+        await db.cursor.execute("DELETE FROM doctors WHERE id = %s", (doctor_id,))
+        await db.conn.commit()
     
         return
 
@@ -79,27 +109,27 @@ def delete_doctor(doctor_id: int, current_user: TokenData = Depends(get_current_
         raise http_error
     
     except Exception:
-        db.conn.rollback()
+        await db.conn.rollback()
         raise HTTPException(status_code=500, detail="Internal server error")
     
 @router.put("/{doctor_id}", response_model=DoctorResponse)
-def put_patient(doctor_id: int, doctor: DoctorsPut, current_user: TokenData = Depends(get_current_doctor)):
+async def put_patient(doctor_id: int, doctor: DoctorsPut, current_user: TokenData = Depends(get_current_doctor), db: Database = Depends(get_db)):
     try:
         validate_logged_in_user(doctor_id, current_user.id)
-        db.cursor.execute("SELECT * FROM doctors WHERE id = %s", (doctor_id,))
-        existing_doctor = db.cursor.fetchone()
+        await db.cursor.execute("SELECT * FROM doctors WHERE id = %s", (doctor_id,))
+        existing_doctor = await db.cursor.fetchone()
         validate_doctor_exists(existing_doctor, doctor_id)
         
-        doctor.password = hash(doctor.password)
-        db.cursor.execute(
+        doctor.password = await hash_async(doctor.password)
+        await db.cursor.execute(
             "UPDATE doctors SET first_name = %s, last_name = %s, email = %s, password = %s, specialty = %s WHERE id = %s", 
             (doctor.first_name, doctor.last_name, doctor.email, doctor.password, doctor.specialty, doctor_id)
         )
-        db.conn.commit()
-        db.cursor.execute("SELECT * FROM doctors WHERE id = %s", (doctor_id,))
-        updated_doctor = db.cursor.fetchone()
+        await db.conn.commit()
+        await db.cursor.execute("SELECT * FROM doctors WHERE id = %s", (doctor_id,))
+        updated_doctor = await db.cursor.fetchone()
 
-        relationship_response = doctor_relationship(updated_doctor, db)
+        relationship_response = await doctor_relationship(updated_doctor, db)
 
         return DoctorResponse(**relationship_response)
     
@@ -107,32 +137,32 @@ def put_patient(doctor_id: int, doctor: DoctorsPut, current_user: TokenData = De
         raise http_error
     
     except Exception:
-        db.conn.rollback()
+        await db.conn.rollback()
         raise HTTPException(status_code=500, detail="Internal server error")
     
 
 @router.patch("/{doctor_id}", response_model=DoctorResponse)
-def patch_patient(doctor_id: int, doctor: DoctorsPatch, current_user: TokenData = Depends(get_current_doctor)):
+async def patch_patient(doctor_id: int, doctor: DoctorsPatch, current_user: TokenData = Depends(get_current_doctor), db: Database = Depends(get_db)):
     try:
         validate_logged_in_user(doctor_id, current_user.id)
-        db.cursor.execute("SELECT * FROM doctors WHERE id = %s", (doctor_id,))
-        existing_doctor = db.cursor.fetchone()
+        await db.cursor.execute("SELECT * FROM doctors WHERE id = %s", (doctor_id,))
+        existing_doctor = await db.cursor.fetchone()
         validate_doctor_exists(existing_doctor, doctor_id)
 
         if doctor.password:
-            doctor.password = hash(doctor.password)
+            doctor.password = await hash_async(doctor.password)
 
         excluded_values = doctor.dict(exclude_unset=True)
         validate_excluded_values(excluded_values)
         
         sql, values = dynamic_patch_query("doctors", excluded_values, current_user.id)
-        db.cursor.execute(sql, values)
-        db.conn.commit()
+        await db.cursor.execute(sql, values)
+        await db.conn.commit()
 
-        db.cursor.execute("SELECT * FROM doctors WHERE id = %s", (doctor_id,))
-        updated_doctor = db.cursor.fetchone()
+        await db.cursor.execute("SELECT * FROM doctors WHERE id = %s", (doctor_id,))
+        updated_doctor = await db.cursor.fetchone()
 
-        relationship_response = doctor_relationship(updated_doctor, db)
+        relationship_response = await doctor_relationship(updated_doctor, db)
 
         return DoctorResponse(**relationship_response)
     
@@ -140,5 +170,5 @@ def patch_patient(doctor_id: int, doctor: DoctorsPatch, current_user: TokenData
         raise http_exception
     
     except Exception:
-        db.conn.rollback()
+        await db.conn.rollback()
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -1,8 +1,8 @@
 from fastapi import status, APIRouter, HTTPException, Depends
-from ..database import Database
+from ..database import Database, get_db
 from ..body import DoctorToken, PatientToken
 from fastapi.security.oauth2 import OAuth2PasswordRequestForm
-from ..utils import verify
+from ..utils import verify_async
 from ..oauth2 import create_token
 
 #/login/patients and login/doctors (post requests only)
@@ -11,18 +11,16 @@ router = APIRouter(
     tags=["Login"]
 )
 
-db = Database()
-
 @router.post("/patients", response_model=PatientToken)
-def patient_login(credentials: OAuth2PasswordRequestForm = Depends()):
-    db.cursor.execute("SELECT * FROM patients WHERE email = %s", (credentials.username,))
-    patient = db.cursor.fetchone()
+async def patient_login(credentials: OAuth2PasswordRequestForm = Depends(), db: Database = Depends(get_db)):
+    await db.cursor.execute("SELECT * FROM patients WHERE email = %s", (credentials.username,))
+    patient = await db.cursor.fetchone()
 
     if not patient:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="Invalid credentials.")
     
-    if not verify(credentials.password, patient["password"]):
+    if not await verify_async(credentials.password, patient["password"]):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="Invalid credentials.")
     
@@ -31,15 +29,15 @@ def patient_login(credentials: OAuth2PasswordRequestForm = Depends()):
     return {"access_token": access_token, "token_type": "bearer", "patient_id": patient["id"]}
 
 @router.post("/doctors", response_model=DoctorToken)
-def doctor_login(credentials: OAuth2PasswordRequestForm = Depends()):
-    db.cursor.execute("SELECT * FROM doctors WHERE email = %s", (credentials.username,))
-    doctor = db.cursor.fetchone()
+async def doctor_login(credentials: OAuth2PasswordRequestForm = Depends(), db: Database = Depends(get_db)):
+    await db.cursor.execute("SELECT * FROM doctors WHERE email = %s", (credentials.username,))
+    doctor = await db.cursor.fetchone()
     
     if not doctor:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="Invalid credentials.")
     
-    if not verify(credentials.password, doctor["password"]):
+    if not await verify_async(credentials.password, doctor["password"]):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="Invalid credentials.")
 
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from ..utils import password_pool_stats
+from ..oauth2 import token_cache
+
+#runtime counters for the worker pools (get only)
+router = APIRouter(
+    prefix="/metrics",
+    tags=["Metrics"]
+)
+
+@router.get("/passwords")
+async def password_metrics():
+    return password_pool_stats()
+
+@router.get("/tokens")
+async def token_metrics():
+    return token_cache.stats()
\ No newline at end of file
@@ -1,12 +1,24 @@
-from fastapi import APIRouter, status, HTTPException, Depends
-from ..response import PatientResponse
-from ..relationships import patient_relationship
+from fastapi import APIRouter, status, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from ..response import ImportResponse, PatientResponse, PatientSearchResponse
+from ..relationships import PATIENT_COLUMNS, patient_relationship, load_patient_graphs, load_patient_graph
 from ..body import Patient, TokenData
-from ..database import Database
-from typing import List
+from ..database import Database, get_db, insert_row
+from ..serialization import FastJSONResponse, forwarded_headers
+from ..cache import province_cache
+from .. import stats
+from ..config import settings
+from ..bulk import chunks, existing_values, insert_chunk, read_rows, report
+from typing import List, Literal, Optional
+from ..export import NDJSON_MEDIA_TYPE, ndjson_export
+from ..pagination import DEFAULT_LIMIT, MAX_LIMIT, decode_cursor, keyset_page, offset_page
+from ..search import fulltext_query, like_prefix
+from ..etag import PATIENT_VERSION, make_etag, not_modified, not_modified_response, version_etag
+from ..fieldsets import PATIENT_RELATIONSHIPS, patient_fieldset, patient_select
 from ..update import PatientsPut, PatientsPatch, dynamic_patch_query
-from ..utils import hash
-from ..oauth2 import get_current_patient
+from ..utils import hash_async, hash_many_async
+from ..idempotency import Idempotency, idempotency
+from ..oauth2 import get_current_doctor, get_current_patient
 from ..status_codes import validate_excluded_values, validate_logged_in_user, validate_patient_exists, validate_province_exists
 
 #patient requests (get all/by id, post, delete, put, patch)
@@ -15,78 +27,186 @@ router = APIRouter(
     tags=["Patients"]
 )
 
-db = Database()
+FIELDS_QUERY = Query(None, description=f"Comma-separated patient columns to return: {', '.join(PATIENT_COLUMNS)}")
+INCLUDE_QUERY = Query(None, description=f"Comma-separated relationships to load: {', '.join(PATIENT_RELATIONSHIPS)}. With fields or include set, only what is asked for is returned")
 
 @router.get("/", response_model=List[PatientResponse])
-def get_patients():
-    db.cursor.execute("SELECT * FROM patients")
-    patients = db.cursor.fetchall()
+async def get_patients(response: Response, limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT), after: Optional[str] = None, fields: Optional[str] = FIELDS_QUERY, include: Optional[str] = INCLUDE_QUERY, db: Database = Depends(get_db)):
+    sparse = patient_fieldset(fields, include)
+    if sparse:
+        selected, included = sparse
+        patients = await keyset_page(db, "patients", after, limit, response, patient_select(selected, included))
+        return FastJSONResponse(await load_patient_graphs(patients, db, selected, included), trusted=True, headers=forwarded_headers(response))
 
-    relationship_response = []
-    for patient in patients:
-        new_patient = patient_relationship(patient, db)
-        relationship_response.append(PatientResponse(**new_patient))                #[PatientResponse(**row) for row in patients] original before relationship
+    patients = await keyset_page(db, "patients", after, limit, response)
 
-    return relationship_response
+    return FastJSONResponse(await load_patient_graphs(patients, db), model=List[PatientResponse], headers=forwarded_headers(response))
+
+#streams every patient with their province and admissions, one JSON document per line
+@router.get("/export", response_class=StreamingResponse, responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}})
+async def export_patients(format: Literal["ndjson"] = "ndjson"):
+    return await ndjson_export("patients", load_patient_graphs, PatientResponse)
+
+#ranked name/email lookup for the front desk - full-text match (best score first) when the query has a word of
+#3+ characters, otherwise a prefix match on the name and email indexes
+@router.get("/search", response_model=List[PatientSearchResponse])
+async def search_patients(response: Response, q: str = Query(..., min_length=1, max_length=100), limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT), after: Optional[str] = None, db: Database = Depends(get_db)):
+    q = q.strip()
+    #a blank prefix would match (and sort) every patient
+    if not q:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="q must contain at least one non-space character")
+
+    offset = decode_cursor(after, "offset")
+    query = fulltext_query(q)
+
+    if query:
+        await db.cursor.execute("""
+            SELECT id, first_name, last_name, email, birth_date
+            FROM patients
+            WHERE MATCH (first_name, last_name, email) AGAINST (%s IN BOOLEAN MODE)
+            ORDER BY MATCH (first_name, last_name, email) AGAINST (%s IN BOOLEAN MODE) DESC, id
+            LIMIT %s OFFSET %s
+            """, (query, query, limit + 1, offset)
+        )
+    else:
+        #one range scan per index, each stopping after the rows this page can need (an OR over the three columns would
+        #merge the indexes and sort every match) - last name matches first, then first name, then email,
+        #each in its index order; a patient is listed once, under the first column that matches
+        prefix = like_prefix(q)
+        needed = offset + limit + 1
+        await db.cursor.execute("""
+            (SELECT id, first_name, last_name, email, birth_date, 0 AS tier FROM patients
+                WHERE last_name LIKE %s
+                ORDER BY last_name, first_name, id LIMIT %s)
+            UNION ALL
+            (SELECT id, first_name, last_name, email, birth_date, 1 AS tier FROM patients
+                WHERE first_name LIKE %s AND last_name NOT LIKE %s
+                ORDER BY first_name, id LIMIT %s)
+            UNION ALL
+            (SELECT id, first_name, last_name, email, birth_date, 2 AS tier FROM patients
+                WHERE email LIKE %s AND first_name NOT LIKE %s AND last_name NOT LIKE %s
+                ORDER BY email LIMIT %s)
+            ORDER BY tier, CASE tier WHEN 0 THEN last_name WHEN 1 THEN first_name ELSE email END, CASE tier WHEN 0 THEN first_name END, id
+            LIMIT %s OFFSET %s
+            """, (prefix, needed, prefix, prefix, needed, prefix, prefix, prefix, needed, limit + 1, offset)
+        )
+
+    patients = offset_page(await db.cursor.fetchall(), offset, limit, response)
+
+    return FastJSONResponse(patients, model=List[PatientSearchResponse], headers=forwarded_headers(response))
 
 @router.post("/", response_model=PatientResponse)
-def create_patient(patient: Patient):
+async def create_patient(patient: Patient, key: Idempotency = Depends(idempotency), db: Database = Depends(get_db)):
     try:
-        db.cursor.execute("SELECT * FROM provinces WHERE id = %s", (patient.province_id,))
-        province = db.cursor.fetchone()
+        replayed = await key.reserve(db)
+        if replayed:
+            return replayed
+
+        province = await province_cache.get(patient.province_id, db)
         validate_province_exists(province, patient.province_id)
 
-        patient.password = hash(patient.password)
-        db.cursor.execute("""INSERT INTO patients (province_id, first_name, last_name, email, password, gender, birth_date, allergies, height_cm, weight_kg) 
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s,  %s, %s)""", (
-                patient.province_id, 
-                patient.first_name, 
-                patient.last_name,
-                patient.email,
-                patient.password, 
-                patient.gender, 
-                patient.birth_date,
-                patient.allergies, 
-                patient.height_cm, 
-                patient.weight_kg
-            )
-        )
-        db.conn.commit()
+        patient.password = await hash_async(patient.password)
+        #birth_date is a DATE column - drop any time part so the returned row matches the stored one
+        created_patient = await insert_row(db, "patients", {**patient.dict(), "birth_date": patient.birth_date.date()})
 
-        db.cursor.execute("SELECT * FROM patients WHERE id = LAST_INSERT_ID()")
-        created_patient = db.cursor.fetchone()
+        relationship_response = await patient_relationship(created_patient, db)
+        response = FastJSONResponse(relationship_response, model=PatientResponse)
 
-        relationship_response = patient_relationship(created_patient, db)
+        await key.save(db, response)
+        await db.conn.commit()
 
-        return PatientResponse(**relationship_response)
+        return response
 
     except HTTPException as http_exception:
         raise http_exception
     
     except Exception as e:
-        db.conn.rollback()
+        await db.conn.rollback()
         raise HTTPException(status_code=500, detail=f"{e}")
     
+#bulk onboarding - NDJSON (one Patient object per line) or CSV with a header row; done by a logged in doctor
+@router.post("/import", response_model=ImportResponse, openapi_extra={"requestBody": {"content": {NDJSON_MEDIA_TYPE: {}, "text/csv": {}}}})
+async def import_patients(request: Request, current_doctor: TokenData = Depends(get_current_doctor), db: Database = Depends(get_db)):
+    rows, errors = await read_rows(request, Patient, settings.import_max_rows)
+    received = len(rows) + len(errors)
+
+    provinces = await province_cache.get_many([patient.province_id for _, patient in rows], db)
+    seen_emails = set()
+    accepted = []
+    for line, patient in rows:
+        if patient.province_id not in provinces:
+            errors.append({"line": line, "error": f"Province with id {patient.province_id} was not found"})
+        elif patient.email in seen_emails:
+            errors.append({"line": line, "error": f"Email {patient.email} appears more than once in the import"})
+        else:
+            seen_emails.add(patient.email)
+            accepted.append((line, patient))
+
+    sql = """INSERT INTO patients (province_id, first_name, last_name, email, password, gender, birth_date, allergies, height_cm, weight_kg)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
+    imported = 0
+    for chunk in chunks(accepted, settings.import_chunk_size):
+        taken = await existing_values(db, "patients", "email", [patient.email for _, patient in chunk])
+        errors.extend({"line": line, "error": f"Email {patient.email} is already registered"} for line, patient in chunk if patient.email in taken)
+        chunk = [(line, patient) for line, patient in chunk if patient.email not in taken]
+
+        try:
+            passwords = await hash_many_async([patient.password for _, patient in chunk])
+        except HTTPException as busy:
+            #the password pool is full (503) - earlier chunks are already committed, so this chunk is reported as
+            #failed (safe to send again) instead of ending the request without a report
+            errors.extend({"line": line, "error": busy.detail} for line, _ in chunk)
+            continue
+
+        values = [
+            (line, (patient.province_id, patient.first_name, patient.last_name, patient.email, password,
+                    patient.gender, patient.birth_date, patient.allergies, patient.height_cm, patient.weight_kg))
+            for (line, patient), password in zip(chunk, passwords)
+        ]
+
+        inserted, failed = await insert_chunk(db, sql, values)
+        imported += inserted
+        errors.extend(failed)
+
+    return ImportResponse(**report(received, imported, errors))
+
 @router.get("/{patient_id}", response_model=PatientResponse)
-def get_patient_by_id(patient_id: int):
-    db.cursor.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
-    patient = db.cursor.fetchone()
-    validate_patient_exists(patient, patient_id)
+async def get_patient_by_id(patient_id: int, request: Request, response: Response, fields: Optional[str] = FIELDS_QUERY, include: Optional[str] = INCLUDE_QUERY, db: Database = Depends(get_db)):
+    sparse = patient_fieldset(fields, include)
+
+    #the version query only runs when it can save the graph read (If-None-Match) or for the sparse reads,
+    #which do not go through the graph JOIN; otherwise the tag comes with the graph
+    if sparse or "if-none-match" in request.headers:
+        etag = await version_etag(request, db, PATIENT_VERSION, patient_id)
+        validate_patient_exists(etag, patient_id)
+        if not_modified(request, etag):
+            return not_modified_response(etag)
+
+    if sparse:
+        selected, included = sparse
+        await db.cursor.execute(f"SELECT {', '.join(patient_select(selected, included))} FROM patients WHERE id = %s", (patient_id,))
+        patient = await db.cursor.fetchone()
+        validate_patient_exists(patient, patient_id)
+
+        return FastJSONResponse((await load_patient_graphs([patient], db, selected, included))[0], trusted=True, headers={"ETag": etag})
 
-    relationship_response = patient_relationship(patient, db)
+    relationship_response, version = await load_patient_graph(patient_id, db)
+    validate_patient_exists(relationship_response, patient_id)
 
+    response.headers["ETag"] = make_etag(request, patient_id, *version)
     return PatientResponse(**relationship_response)
 
 @router.delete("/{patient_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_patient(patient_id: int, current_user: TokenData = Depends(get_current_patient)):
+async def delete_patient(patient_id: int, current_user: TokenData = Depends(get_current_patient), db: Database = Depends(get_db)):
     try:   
         validate_logged_in_user(patient_id, current_user.id)
-        db.cursor.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
-        patient = db.cursor.fetchone()
+        await db.cursor.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
+        patient = await db.cursor.fetchone()
         validate_patient_exists(patient, patient_id)
 
-        db.cursor.execute("DELETE FROM patients WHERE id = %s", (patient_id,))
-        db.conn.commit()
+        await stats.remove_patient(db, patient_id)
+        await db.cursor.execute("DELETE FROM patients WHERE id = %s", (patient_id,))
+        await db.conn.commit()
 
         return
     
@@ -94,23 +214,27 @@ def delete_patient(patient_id: int, current_user: TokenData = Depends(get_curren
         raise http_exception
     
     except Exception:
-        db.conn.rollback()
+        await db.conn.rollback()
         raise HTTPException(status_code=500, detail="Internal server error")
     
 @router.put("/{patient_id}", response_model=PatientResponse)
-def put_patient(patient_id: int, patient: PatientsPut, current_user: TokenData = Depends(get_current_patient)):
+async def put_patient(patient_id: int, patient: PatientsPut, current_user: TokenData = Depends(get_current_patient), db: Database = Depends(get_db)):
     try:
         validate_logged_in_user(patient_id, current_user.id)
-        db.cursor.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
-        existing_patient = db.cursor.fetchone()
+        await db.cursor.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
+        existing_patient = await db.cursor.fetchone()
         validate_patient_exists(existing_patient, patient_id)
 
-        db.cursor.execute("SELECT * FROM provinces WHERE id = %s", (patient.province_id,))
-        province = db.cursor.fetchone()
+        province = await province_cache.get(patient.province_id, db)
         validate_province_exists(province, patient.province_id)
 
-        patient.password = hash(patient.password)
-        db.cursor.execute(
+        #a patient moving province takes their admissions' per-province counts along
+        moved = patient.province_id != existing_patient["province_id"]
+        if moved:
+            await stats.remove_patient(db, patient_id)
+
+        patient.password = await hash_async(patient.password)
+        await db.cursor.execute(
             "UPDATE patients SET province_id = %s, first_name = %s, last_name = %s, email = %s, password = %s, gender = %s, birth_date = %s, allergies = %s, height_cm = %s, weight_kg = %s WHERE id = %s", (
                 patient.province_id, 
                 patient.first_name, 
@@ -125,11 +249,13 @@ def put_patient(patient_id: int, patient: PatientsPut, current_user: TokenData =
                 patient_id
             )
         )
-        db.conn.commit()
-        db.cursor.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
-        updated_patient = db.cursor.fetchone()
+        if moved:
+            await stats.add_patient(db, patient_id)
+        await db.conn.commit()
+        await db.cursor.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
+        updated_patient = await db.cursor.fetchone()
 
-        relationship_response = patient_relationship(updated_patient, db)
+        relationship_response = await patient_relationship(updated_patient, db)
 
         return PatientResponse(**relationship_response)
 
@@ -137,42 +263,48 @@ def put_patient(patient_id: int, patient: PatientsPut, current_user: TokenData =
         raise http_exception
     
     except Exception as e:
-        db.conn.rollback()
+        await db.conn.rollback()
         raise HTTPException(status_code=500, detail=f"{e}")
     
 @router.patch("/{patient_id}", response_model=PatientResponse)
-def patch_patient(patient_id: int, patient: PatientsPatch, current_user: TokenData = Depends(get_current_patient)):
+async def patch_patient(patient_id: int, patient: PatientsPatch, current_user: TokenData = Depends(get_current_patient), db: Database = Depends(get_db)):
     try:
         validate_logged_in_user(patient_id, current_user.id)
-        db.cursor.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
-        existing_patient = db.cursor.fetchone()
+        await db.cursor.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
+        existing_patient = await db.cursor.fetchone()
         validate_patient_exists(existing_patient, patient_id)
 
         if patient.province_id:
-            db.cursor.execute("SELECT * FROM provinces WHERE id = %s", (patient.province_id,))
-            province = db.cursor.fetchone()
+            province = await province_cache.get(patient.province_id, db)
             validate_province_exists(province, patient.province_id)
 
         if patient.password:
-            patient.password = hash(patient.password)
+            patient.password = await hash_async(patient.password)
 
         excluded_values= patient.dict(exclude_unset=True)
         validate_excluded_values(excluded_values)
         
+        #a patient moving province takes their admissions' per-province counts along
+        moved = "province_id" in excluded_values and excluded_values["province_id"] != existing_patient["province_id"]
+        if moved:
+            await stats.remove_patient(db, patient_id)
+
         sql, values = dynamic_patch_query("patients", excluded_values, current_user.id)
-        db.cursor.execute(sql, values)
-        db.conn.commit()
+        await db.cursor.execute(sql, values)
+        if moved:
+            await stats.add_patient(db, patient_id)
+        await db.conn.commit()
 
-        db.cursor.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
-        updated_patient = db.cursor.fetchone()
+        await db.cursor.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
+        updated_patient = await db.cursor.fetchone()
 
-        relationship_response = patient_relationship(updated_patient, db)
+        relationship_response = await patient_relationship(updated_patient, db)
         return PatientResponse(**relationship_response)
 
     except HTTPException as http_exception:
         raise http_exception
     
     except Exception as e:
-        db.conn.rollback()
+        await db.conn.rollback()
         raise HTTPException(status_code=500, detail=f"{e}")
     
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, status, HTTPException
+from fastapi import APIRouter, status, HTTPException, Depends, Query, Request, Response
 from ..body import Province
 from ..response import ProvinceResponse
-from ..database import Database
+from ..database import Database, get_db, insert_row
+from ..serialization import FastJSONResponse, forwarded_headers
+from ..cache import province_cache
+from .. import stats
+from ..etag import make_etag, not_modified, not_modified_response
 from ..update import ProvincesPut, ProvincesPatch, dynamic_patch_query
 from ..status_codes import validate_province_exists, validate_excluded_values
-from typing import List
+from typing import List, Optional
+from ..pagination import DEFAULT_LIMIT, MAX_LIMIT, keyset_page
 
 #provinces requests (get all/by id, post, delete, put, patch)
 router = APIRouter(
@@ -12,23 +17,18 @@ router = APIRouter(
     tags=["Provinces"]
 )
 
-db = Database()
-
 @router.get("/", response_model=List[ProvinceResponse])
-def get_provinces():
-    db.cursor.execute("SELECT * FROM provinces")
-    provinces = db.cursor.fetchall()
-    return [ProvinceResponse(**row) for row in provinces]
+async def get_provinces(response: Response, limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT), after: Optional[str] = None, db: Database = Depends(get_db)):
+    provinces = await keyset_page(db, "provinces", after, limit, response)
+    return FastJSONResponse(provinces, model=List[ProvinceResponse], headers=forwarded_headers(response))
 
 
 @router.post("/", response_model=ProvinceResponse, status_code=status.HTTP_201_CREATED)
-def create_province(province: Province):
+async def create_province(province: Province, db: Database = Depends(get_db)):
     try:
-        db.cursor.execute("INSERT INTO provinces (name, city) VALUES (%s, %s)", (province.name, province.city))
-        db.conn.commit()
-
-        db.cursor.execute("SELECT * FROM provinces WHERE id = LAST_INSERT_ID()")
-        created = db.cursor.fetchone()
+        created = await insert_row(db, "provinces", province.dict())
+        await db.conn.commit()
+        #not cached here - the row has no updated_at yet (the ETag needs it), so the cache reads it on first use
 
         return ProvinceResponse(**created)
 
@@ -36,49 +36,58 @@ def create_province(province: Province):
         raise http_exception
     
     except Exception:
-        db.conn.rollback()
+        await db.conn.rollback()
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @router.get("/{province_id}", response_model=ProvinceResponse)
-def get_province_by_id(province_id: int):
-    db.cursor.execute("SELECT * FROM provinces WHERE id = %s", (province_id,))
-    province = db.cursor.fetchone()
-    
+async def get_province_by_id(province_id: int, request: Request, response: Response, db: Database = Depends(get_db)):
+    province = await province_cache.get(province_id, db)
+    validate_province_exists(province, province_id)
+
+    #the cached row carries updated_at, so the tag costs no query at all
+    etag = make_etag(request, province_id, province["updated_at"])
+    if not_modified(request, etag):
+        return not_modified_response(etag)
+
+    response.headers["ETag"] = etag
     return ProvinceResponse(**province)
 
 
 @router.delete("/{province_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_province(province_id: int):
+async def delete_province(province_id: int, db: Database = Depends(get_db)):
     try:
-        db.cursor.execute("SELECT * FROM provinces WHERE id = %s", (province_id,))
-        deleted_province = db.cursor.fetchone()
+        await db.cursor.execute("SELECT * FROM provinces WHERE id = %s", (province_id,))
+        deleted_province = await db.cursor.fetchone()
         validate_province_exists(deleted_province, province_id)
 
-        db.cursor.execute("DELETE FROM provinces WHERE id = %s", (province_id,))
+        await stats.remove_province(db, province_id)
+        await db.cursor.execute("DELETE FROM provinces WHERE id = %s", (province_id,))
 
-        db.conn.commit()
+        await db.conn.commit()
+        province_cache.remove(province_id)
         return 
 
     except HTTPException as http_exception:
         raise http_exception
     
     except Exception:
-        db.conn.rollback()
+        await db.conn.rollback()
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @router.put("/{province_id}", response_model=ProvinceResponse)
-def put_province(province_id: int, province: ProvincesPut):
+async def put_province(province_id: int, province: ProvincesPut, db: Database = Depends(get_db)):
     try:
-        db.cursor.execute("SELECT * FROM provinces WHERE id = %s", (province_id,))
-        existing_province = db.cursor.fetchone()
+        await db.cursor.execute("SELECT * FROM provinces WHERE id = %s", (province_id,))
+        existing_province = await db.cursor.fetchone()
         validate_province_exists(existing_province, province_id)
 
-        db.cursor.execute("UPDATE provinces SET name = %s, city = %s WHERE id = %s", (province.name, province.city, province_id))
-        db.conn.commit()
-        db.cursor.execute("SELECT * FROM provinces WHERE id = %s", (province_id,))
-        updated_province = db.cursor.fetchone()
+        await db.cursor.execute("UPDATE provinces SET name = %s, city = %s WHERE id = %s", (province.name, province.city, province_id))
+        await db.conn.commit()
+        await db.cursor.execute("SELECT * FROM provinces WHERE id = %s", (province_id,))
+        updated_province = await db.cursor.fetchone()
+        province_cache.put(updated_province)
 
         return ProvinceResponse(**updated_province)
 
@@ -86,26 +95,27 @@ def put_province(province_id: int, province: ProvincesPut):
         raise http_exception
     
     except Exception:
-        db.conn.rollback()
+        await db.conn.rollback()
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @router.patch("/{province_id}", response_model=ProvinceResponse)
-def patch_province(province_id: int, province: ProvincesPatch):
+async def patch_province(province_id: int, province: ProvincesPatch, db: Database = Depends(get_db)):
     try:
-        db.cursor.execute("SELECT * FROM provinces WHERE id = %s", (province_id,))
-        existing_province = db.cursor.fetchone()
+        await db.cursor.execute("SELECT * FROM provinces WHERE id = %s", (province_id,))
+        existing_province = await db.cursor.fetchone()
         validate_province_exists(existing_province, province_id)
 
         excluded_values= province.dict(exclude_unset=True)
         validate_excluded_values(excluded_values)
         
         sql, values = dynamic_patch_query("provinces", excluded_values, province_id)
-        db.cursor.execute(sql, values)
-        db.conn.commit()
+        await db.cursor.execute(sql, values)
+        await db.conn.commit()
 
-        db.cursor.execute("SELECT * FROM provinces WHERE id = %s", (province_id,))
-        updated_province = db.cursor.fetchone()
+        await db.cursor.execute("SELECT * FROM provinces WHERE id = %s", (province_id,))
+        updated_province = await db.cursor.fetchone()
+        province_cache.put(updated_province)
 
         return ProvinceResponse(**updated_province)
 
@@ -113,5 +123,5 @@ def patch_province(province_id: int, province: ProvincesPatch):
         raise http_exception
     
     except Exception:
-        db.conn.rollback()
+        await db.conn.rollback()
         raise HTTPException(status_code=500, detail="Internal server error")
\ No newline at end of file
@@ -1,10 +1,17 @@
-from fastapi import APIRouter, status, HTTPException, Depends
-from ..response import AdmissionResponse, DoctorPatientDetailResponse
-from ..relationships import admission_relationship, patient_relationship
+from fastapi import APIRouter, status, HTTPException, Depends, Query, Request, Response
+from ..response import AdmissionResponse, DoctorPatientDetailResponse, ImportResponse
+from ..relationships import admission_relationship, load_patient_graphs, fetch_by_ids
 from ..body import AdmittedPatient, TokenData
-from typing import List
-from ..database import Database
+from typing import List, Optional
+from ..database import Database, get_db, insert_row
+from ..serialization import FastJSONResponse, forwarded_headers
+from ..pagination import DEFAULT_LIMIT, MAX_LIMIT, decode_cursor, page
+from ..config import settings
+from ..export import NDJSON_MEDIA_TYPE
+from ..bulk import chunks, insert_chunk, read_rows, report
+from .. import stats
 from ..oauth2 import get_current_doctor
+from ..idempotency import Idempotency, idempotency
 from ..status_codes import validate_logged_in_user, validate_patient_exists, validate_doctor_admissions
 
 #patients from a particular doctor
@@ -16,98 +23,123 @@ router = APIRouter(
     tags=["Patients of Doctors"]
 )
 
-db = Database()
+#one row per patient: the doctor's admissions are grouped per patient (on the doctor/patient/date index), so the
+#page and the relationship loading scale with distinct patients instead of admissions
+DOCTOR_PATIENTS = """
+    SELECT
+        patients.*,
+        grouped.admission_id,
+        grouped.latest_status
+    FROM (
+        SELECT
+            patient_id,
+            CAST(SUBSTRING_INDEX(GROUP_CONCAT(id ORDER BY admission_date DESC, id DESC), ',', 1) AS UNSIGNED) AS admission_id,
+            SUBSTRING_INDEX(GROUP_CONCAT(status ORDER BY admission_date DESC, id DESC), ',', 1) AS latest_status
+        FROM admissions
+        WHERE doctor_id = %s AND {condition}
+        GROUP BY patient_id
+        ORDER BY patient_id
+        LIMIT %s
+    ) grouped
+    JOIN patients ON patients.id = grouped.patient_id
+    ORDER BY patients.id
+"""
+
+async def doctor_patient_graphs(doctor_id: int, patients, db: Database):
+    #admission_ids come from the batch-loaded admissions, so they are never cut short by group_concat_max_len
+    graphs = await load_patient_graphs(patients, db)
+    for graph in graphs:
+        graph["admission_ids"] = [admission["id"] for admission in graph["admissions"] if admission["doctor_id"] == doctor_id]
+
+    return graphs
 
 @router.get("/", response_model=List[DoctorPatientDetailResponse])
-def patients_of_doctor(doctor_id: int, current_doctor: TokenData = Depends(get_current_doctor)):
+async def patients_of_doctor(doctor_id: int, response: Response, limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT), after: Optional[str] = None, current_doctor: TokenData = Depends(get_current_doctor), db: Database = Depends(get_db)):
     validate_logged_in_user(doctor_id, current_doctor.id)
-    db.cursor.execute("""
-            SELECT 
-                patients.*,
-                admissions.id AS admission_id
-            FROM patients 
-            JOIN admissions ON admissions.patient_id = patients.id 
-            WHERE admissions.doctor_id = %s
-            """, (doctor_id,)
-    )
-    patients = db.cursor.fetchall()
-    
-    relationship_response = []
-    for patient in patients:
-        new_patient = patient_relationship(patient, db)
-        relationship_response.append(DoctorPatientDetailResponse(**new_patient))        #[RelationResponse(**row) for row in patients] - before relationship implementation
+    await db.cursor.execute(DOCTOR_PATIENTS.format(condition="patient_id > %s"), (doctor_id, decode_cursor(after), limit + 1))
+    patients = page(await db.cursor.fetchall(), limit, response)
 
-    return relationship_response
+    return FastJSONResponse(await doctor_patient_graphs(doctor_id, patients, db), model=List[DoctorPatientDetailResponse], headers=forwarded_headers(response))
 
 #Assign an existing patient to a doctor (admission)
 @router.post("/", response_model=AdmissionResponse)
-def assign_a_patient(doctor_id: int, assign_patient: AdmittedPatient, current_doctor: TokenData = Depends(get_current_doctor)):
+async def assign_a_patient(doctor_id: int, assign_patient: AdmittedPatient, key: Idempotency = Depends(idempotency), current_doctor: TokenData = Depends(get_current_doctor), db: Database = Depends(get_db)):
     try:
         validate_logged_in_user(doctor_id, current_doctor.id)
-        db.cursor.execute("SELECT * FROM patients WHERE id = %s", (assign_patient.patient_id,))
-        existing_patient = db.cursor.fetchone()
+        replayed = await key.reserve(db)
+        if replayed:
+            return replayed
+
+        await db.cursor.execute("SELECT * FROM patients WHERE id = %s", (assign_patient.patient_id,))
+        existing_patient = await db.cursor.fetchone()
         validate_patient_exists(existing_patient, assign_patient.patient_id)
         
-        if assign_patient.admission_date:
-            db.cursor.execute(
-                "INSERT INTO admissions (patient_id, doctor_id, diagnosis, status, admission_date) VALUES (%s, %s, %s, %s, %s)",
-                (
-                    assign_patient.patient_id,
-                    current_doctor.id,
-                    assign_patient.diagnosis,
-                    assign_patient.status,
-                    assign_patient.admission_date
-                )
-            )
-        else:
-            db.cursor.execute(
-                "INSERT INTO admissions (patient_id, doctor_id, diagnosis, status) VALUES (%s, %s, %s, %s)",
-                (
-                    assign_patient.patient_id,
-                    current_doctor.id,
-                    assign_patient.diagnosis,
-                    assign_patient.status
-                )
-            )
-        db.conn.commit()
-
-        db.cursor.execute(
-            "SELECT * FROM admissions WHERE patient_id = %s AND doctor_id = %s ORDER BY admission_date DESC LIMIT 1", 
-            (assign_patient.patient_id, current_doctor.id))
-        assigned_patient = db.cursor.fetchone()
-
-        relationship_response = admission_relationship(assigned_patient, db)
-
-        return AdmissionResponse(**relationship_response)
+        #without an admission_date the server default applies
+        assigned_patient = await insert_row(db, "admissions", {**assign_patient.dict(), "doctor_id": current_doctor.id})
+
+        await stats.record(db, added=[{**assigned_patient, "province_id": existing_patient["province_id"]}])
+
+        relationship_response = await admission_relationship(assigned_patient, db)
+        response = FastJSONResponse(relationship_response, model=AdmissionResponse)
+
+        await key.save(db, response)
+        await db.conn.commit()
+
+        return response
     
     except HTTPException as http_error:
         raise http_error
     
     except Exception as e:
+        await db.conn.rollback()
         raise HTTPException(status_code=500, detail=f"{e}")
 
+#bulk admissions for the logged in doctor - NDJSON (one AdmittedPatient object per line) or CSV with a header row
+@router.post("/import", response_model=ImportResponse, openapi_extra={"requestBody": {"content": {NDJSON_MEDIA_TYPE: {}, "text/csv": {}}}})
+async def import_admissions(doctor_id: int, request: Request, current_doctor: TokenData = Depends(get_current_doctor), db: Database = Depends(get_db)):
+    validate_logged_in_user(doctor_id, current_doctor.id)
+    rows, errors = await read_rows(request, AdmittedPatient, settings.import_max_rows)
+    received = len(rows) + len(errors)
+
+    sql = "INSERT INTO admissions (patient_id, doctor_id, diagnosis, status, admission_date) VALUES (%s, %s, %s, %s, %s)"
+    imported = 0
+
+    for chunk in chunks(rows, settings.import_chunk_size):
+        patients = await fetch_by_ids(db, "patients", [admission.patient_id for _, admission in chunk], ("id", "province_id"))
+        errors.extend({"line": line, "error": f"Patient with id {admission.patient_id} was not found"} for line, admission in chunk if admission.patient_id not in patients)
+        chunk = [(line, admission) for line, admission in chunk if admission.patient_id in patients]
+
+        #rows without an admission_date get the server's current time, read once per chunk, so every row is
+        #written explicitly and the census counters know each row's values
+        await db.cursor.execute("SELECT CURRENT_TIMESTAMP AS now")
+        now = (await db.cursor.fetchone())["now"]
+
+        values = [(line, (admission.patient_id, current_doctor.id, admission.diagnosis, admission.status, admission.admission_date or now)) for line, admission in chunk]
+
+        async def count_admissions(db, inserted):
+            await stats.record(db, added=[
+                {"doctor_id": doctor_id, "status": status, "admission_date": admission_date, "discharge_date": None, "province_id": patients[patient_id]["province_id"]}
+                for _, (patient_id, doctor_id, _, status, admission_date) in inserted
+            ])
+
+        inserted, failed = await insert_chunk(db, sql, values, on_insert=count_admissions)
+        imported += inserted
+        errors.extend(failed)
+
+    return ImportResponse(**report(received, imported, errors))
+
 @router.get("/{patient_id}", response_model=DoctorPatientDetailResponse)
-def patient_of_doctor(doctor_id: int, patient_id: int, current_doctor: TokenData = Depends(get_current_doctor)):
+async def patient_of_doctor(doctor_id: int, patient_id: int, current_doctor: TokenData = Depends(get_current_doctor), db: Database = Depends(get_db)):
     validate_logged_in_user(doctor_id, current_doctor.id)
-    db.cursor.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
-    existing_patient = db.cursor.fetchone()
+    await db.cursor.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
+    existing_patient = await db.cursor.fetchone()
     validate_patient_exists(existing_patient, patient_id)
 
-    db.cursor.execute("""
-                SELECT 
-                    patients.*,
-                    admissions.id AS admission_id
-                FROM patients 
-                JOIN admissions 
-                ON admissions.patient_id = patients.id 
-                WHERE admissions.doctor_id = %s AND admissions.patient_id = %s 
-                LIMIT 1""", 
-        (current_doctor.id, patient_id)
-    )
-    patient = db.cursor.fetchone()
+    await db.cursor.execute(DOCTOR_PATIENTS.format(condition="patient_id = %s"), (current_doctor.id, patient_id, 1))
+    patient = await db.cursor.fetchone()
     validate_doctor_admissions(patient)
 
-    relationship_response = patient_relationship(patient, db)
+    relationship_response = (await doctor_patient_graphs(current_doctor.id, [patient], db))[0]
 
     return DoctorPatientDetailResponse(**relationship_response)
 
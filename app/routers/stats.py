@@ -0,0 +1,76 @@
+from fastapi import APIRouter, Depends, Query, Response
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+from ..response import CensusResponse, DoctorCensusResponse, ProvinceDailyAdmissionsResponse
+from ..database import Database, get_db
+from ..serialization import FastJSONResponse, forwarded_headers
+from ..pagination import DEFAULT_LIMIT, MAX_LIMIT, decode_cursor, page
+from ..status_codes import validate_doctor_exists
+
+#occupancy and census dashboards (get only) - read from the counters app/stats.py maintains, never from admissions
+router = APIRouter(
+    prefix="/stats",
+    tags=["Stats"]
+)
+
+def average_stay_hours(row):
+    return round(row["stay_seconds"] / row["discharged"] / 3600, 2) if row["discharged"] else None
+
+def doctor_census(row):
+    return {
+        "doctor_id": row["doctor_id"],
+        "admissions": row["admissions"],
+        "sick": row["sick"],
+        "discharged": row["discharged"],
+        "average_stay_hours": average_stay_hours(row)
+    }
+
+@router.get("/census", response_model=CensusResponse)
+async def census(db: Database = Depends(get_db)):
+    await db.cursor.execute("SELECT admissions, sick, discharged, stay_seconds FROM census_totals WHERE id = 1")
+    totals = await db.cursor.fetchone() or {"admissions": 0, "sick": 0, "discharged": 0, "stay_seconds": 0}
+
+    return CensusResponse(
+        admissions=totals["admissions"],
+        sick=totals["sick"],
+        discharged=totals["discharged"],
+        average_stay_hours=average_stay_hours(totals)
+    )
+
+@router.get("/doctors", response_model=List[DoctorCensusResponse])
+async def doctors_census(response: Response, limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT), after: Optional[str] = None, db: Database = Depends(get_db)):
+    await db.cursor.execute("SELECT * FROM doctor_census WHERE doctor_id > %s ORDER BY doctor_id LIMIT %s", (decode_cursor(after), limit + 1))
+    rows = page(await db.cursor.fetchall(), limit, response, key="doctor_id")
+
+    return FastJSONResponse([doctor_census(row) for row in rows], model=List[DoctorCensusResponse], headers=forwarded_headers(response))
+
+@router.get("/doctors/{doctor_id}", response_model=DoctorCensusResponse)
+async def doctor_census_by_id(doctor_id: int, db: Database = Depends(get_db)):
+    await db.cursor.execute("SELECT * FROM doctor_census WHERE doctor_id = %s", (doctor_id,))
+    row = await db.cursor.fetchone()
+
+    if not row:
+        #doctors without admissions have no counter row yet
+        await db.cursor.execute("SELECT id FROM doctors WHERE id = %s", (doctor_id,))
+        validate_doctor_exists(await db.cursor.fetchone(), doctor_id)
+        row = {"doctor_id": doctor_id, "admissions": 0, "sick": 0, "discharged": 0, "stay_seconds": 0}
+
+    return DoctorCensusResponse(**doctor_census(row))
+
+#admissions per province per day (by the patient's province and the admission date), the last 30 days by default
+@router.get("/provinces/daily", response_model=List[ProvinceDailyAdmissionsResponse])
+async def province_daily_admissions(province_id: Optional[int] = None, since: Optional[date] = None, until: Optional[date] = None, db: Database = Depends(get_db)):
+    #the buckets are UTC days (the sessions run in UTC), so "today" is the UTC date, not the host's
+    until = until or datetime.utcnow().date()
+    since = since or until - timedelta(days=30)
+
+    if province_id is not None:
+        await db.cursor.execute(
+            "SELECT * FROM province_daily_admissions WHERE province_id = %s AND day BETWEEN %s AND %s AND admissions <> 0 ORDER BY day",
+            (province_id, since, until))
+    else:
+        await db.cursor.execute(
+            "SELECT * FROM province_daily_admissions WHERE day BETWEEN %s AND %s AND admissions <> 0 ORDER BY day, province_id",
+            (since, until))
+
+    return FastJSONResponse(await db.cursor.fetchall(), model=List[ProvinceDailyAdmissionsResponse])
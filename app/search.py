@@ -0,0 +1,16 @@
+import re
+
+#helpers for the search endpoints - user text never reaches the SQL, only these escaped parameters
+#InnoDB ignores full-text terms shorter than innodb_ft_min_token_size (3 by default)
+FULLTEXT_MIN_TOKEN = 3
+
+def like_prefix(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def fulltext_query(q: str):
+    #"maria san" -> "+maria* +san*" (every word must match, as a prefix); None when no word is long enough
+    terms = [term for term in re.findall(r"\w+", q.lower()) if len(term) >= FULLTEXT_MIN_TOKEN]
+    if not terms:
+        return None
+
+    return " ".join(f"+{term}*" for term in terms)
@@ -0,0 +1,41 @@
+from datetime import date, datetime
+from functools import lru_cache
+import orjson
+from fastapi import Response
+from pydantic import TypeAdapter
+
+#fast response path - returning a Response skips FastAPI's response_model pass (validate the returned models again,
+#jsonable_encoder, json.dumps), so the content is validated once here and dumped to bytes by pydantic-core
+#keep response_model on the route so the OpenAPI docs stay the same
+@lru_cache(maxsize=None)
+def adapter(model) -> TypeAdapter:
+    return TypeAdapter(model)
+
+def encode_default(value):
+    #trusted content skips the models, so dates are written the way the datetime fields of the models write them
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day).isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def forwarded_headers(response: Response) -> dict:
+    #headers set on the injected Response (e.g. X-Next-Cursor) are dropped once a handler returns its own response
+    return {key: value for key, value in response.headers.items() if key not in ("content-length", "content-type")}
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def __init__(self, content, model=None, trusted: bool = False, **kwargs):
+        #model - the response type (e.g. List[PatientResponse]); rows are validated against it and extra columns are dropped
+        #trusted - content is already shaped for the client (whitelisted columns only) and is encoded as-is with orjson
+        self.model = model
+        self.trusted = trusted
+        super().__init__(content, **kwargs)
+
+    def render(self, content) -> bytes:
+        if self.trusted or self.model is None:
+            return orjson.dumps(content, default=encode_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+
+        model_adapter = adapter(self.model)
+        return model_adapter.dump_json(model_adapter.validate_python(content))
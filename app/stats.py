@@ -0,0 +1,133 @@
+import argparse
+import asyncio
+import sys
+from collections import defaultdict
+from .database import Database
+
+#census counters (migration 6) kept in step with admissions, in the same transaction as the write that changes them
+#  doctor_census              - admissions, currently sick, discharged and total stay per doctor
+#  province_daily_admissions  - admissions per patient province per admission day
+#  census_totals              - the same counters for the whole hospital, a single row (id 1)
+#the /stats endpoints read these rows directly instead of aggregating admissions
+
+DOCTOR_UPSERT = """
+    INSERT INTO doctor_census (doctor_id, admissions, sick, discharged, stay_seconds) VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE admissions = admissions + VALUES(admissions), sick = sick + VALUES(sick),
+        discharged = discharged + VALUES(discharged), stay_seconds = stay_seconds + VALUES(stay_seconds)
+"""
+
+PROVINCE_UPSERT = """
+    INSERT INTO province_daily_admissions (province_id, day, admissions) VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE admissions = admissions + VALUES(admissions)
+"""
+
+TOTALS_UPSERT = """
+    INSERT INTO census_totals (id, admissions, sick, discharged, stay_seconds) VALUES (1, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE admissions = admissions + VALUES(admissions), sick = sick + VALUES(sick),
+        discharged = discharged + VALUES(discharged), stay_seconds = stay_seconds + VALUES(stay_seconds)
+"""
+
+def counters(admission) -> tuple:
+    #(admissions, sick, discharged, stay_seconds) one admission contributes
+    discharged = admission["discharge_date"] is not None
+    stay = int((admission["discharge_date"] - admission["admission_date"]).total_seconds()) if discharged else 0
+
+    return 1, int(admission["status"] == "sick"), int(discharged), stay
+
+async def record(db: Database, added=(), removed=()):
+    #admission rows as written (added) or as they were before the write (removed), each with the patient's province_id
+    #an update is the old row removed plus the new row added; nothing is committed here
+    doctors = defaultdict(lambda: [0, 0, 0, 0])
+    days = defaultdict(int)
+    totals = [0, 0, 0, 0]
+
+    for sign, admissions in ((1, added), (-1, removed)):
+        for admission in admissions:
+            values = counters(admission)
+            for i, value in enumerate(values):
+                doctors[admission["doctor_id"]][i] += sign * value
+                totals[i] += sign * value
+            days[(admission["province_id"], admission["admission_date"].date())] += sign
+
+    doctor_rows = [(doctor_id, *values) for doctor_id, values in doctors.items() if any(values)]
+    day_rows = [(province_id, day, count) for (province_id, day), count in days.items() if count]
+
+    if doctor_rows:
+        await db.cursor.executemany(DOCTOR_UPSERT, doctor_rows)
+    if day_rows:
+        await db.cursor.executemany(PROVINCE_UPSERT, day_rows)
+    if any(totals):
+        await db.cursor.execute(TOTALS_UPSERT, tuple(totals))
+
+
+#set-based variant for writes that touch many admissions at once (cascading deletes, a patient moving province, the rebuild)
+#where - a condition on admissions aliased as `a`; sign is +1 to add the matching admissions, -1 to remove them
+#migration 6 fills the new tables with apply_statements("TRUE", 1), the same statements the rebuild runs
+def apply_statements(where: str, sign: int) -> tuple:
+    sign = 1 if sign > 0 else -1
+    stay = "IF(a.discharge_date IS NULL, 0, TIMESTAMPDIFF(SECOND, a.admission_date, a.discharge_date))"
+
+    return (f"""
+        INSERT INTO doctor_census (doctor_id, admissions, sick, discharged, stay_seconds)
+        SELECT a.doctor_id, {sign} * COUNT(*), {sign} * SUM(a.status = 'sick'), {sign} * SUM(a.discharge_date IS NOT NULL), {sign} * SUM({stay})
+        FROM admissions a WHERE {where} GROUP BY a.doctor_id
+        ON DUPLICATE KEY UPDATE admissions = admissions + VALUES(admissions), sick = sick + VALUES(sick),
+            discharged = discharged + VALUES(discharged), stay_seconds = stay_seconds + VALUES(stay_seconds)
+        """, f"""
+        INSERT INTO province_daily_admissions (province_id, day, admissions)
+        SELECT p.province_id, DATE(a.admission_date), {sign} * COUNT(*)
+        FROM admissions a JOIN patients p ON p.id = a.patient_id WHERE {where} GROUP BY p.province_id, DATE(a.admission_date)
+        ON DUPLICATE KEY UPDATE admissions = admissions + VALUES(admissions)
+        """, f"""
+        INSERT INTO census_totals (id, admissions, sick, discharged, stay_seconds)
+        SELECT 1, {sign} * COUNT(*), {sign} * COALESCE(SUM(a.status = 'sick'), 0), {sign} * COALESCE(SUM(a.discharge_date IS NOT NULL), 0), {sign} * COALESCE(SUM({stay}), 0)
+        FROM admissions a WHERE {where}
+        ON DUPLICATE KEY UPDATE admissions = admissions + VALUES(admissions), sick = sick + VALUES(sick),
+            discharged = discharged + VALUES(discharged), stay_seconds = stay_seconds + VALUES(stay_seconds)
+        """
+    )
+
+async def apply(db: Database, where: str, params: tuple, sign: int):
+    for statement in apply_statements(where, sign):
+        await db.cursor.execute(statement, params)
+
+async def remove_patient(db: Database, patient_id: int):
+    await apply(db, "a.patient_id = %s", (patient_id,), -1)
+
+async def add_patient(db: Database, patient_id: int):
+    await apply(db, "a.patient_id = %s", (patient_id,), 1)
+
+async def remove_doctor(db: Database, doctor_id: int):
+    await apply(db, "a.doctor_id = %s", (doctor_id,), -1)
+
+async def remove_province(db: Database, province_id: int):
+    await apply(db, "a.patient_id IN (SELECT id FROM patients WHERE province_id = %s)", (province_id,), -1)
+
+async def rebuild(db: Database):
+    #recomputes every counter from the admissions table in one transaction
+    for table in ("doctor_census", "province_daily_admissions", "census_totals"):
+        await db.cursor.execute(f"DELETE FROM {table}")
+
+    await apply(db, "TRUE", (), 1)
+    await db.conn.commit()
+
+
+#python -m app.stats rebuild - after bulk loads done outside the API, or if the counters are ever in doubt
+async def main(command: str) -> int:
+    db = await Database.connect()
+    try:
+        if command == "rebuild":
+            await rebuild(db)
+            print("Census counters rebuilt")
+        return 0
+
+    finally:
+        await db.close()
+        db.conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the census summary tables")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(main(args.command)))
@@ -64,4 +64,9 @@ def validate_patient_admissions(admission):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admission of patient was not found"
-        )
\ No newline at end of file
+        )
+
+#result of load_admission_access - 404 when the patient is missing, 403 when the doctor has no admissions for them
+def validate_admission_access(access, patient_id: int = None):
+    validate_patient_exists(access, patient_id)
+    validate_doctor_admissions(access["admissions"])
\ No newline at end of file
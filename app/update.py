@@ -1,6 +1,7 @@
 from pydantic import BaseModel, EmailStr
 from typing import Optional, Literal
 from datetime import datetime
+from .body import StoredDatetime
 
 #Provinces
 class ProvincesPut(BaseModel):
@@ -55,14 +56,14 @@ class DoctorsPatch(BaseModel):
 class AdmissionPut(BaseModel):
     diagnosis: str
     status: Literal["sick", "healthy"] = "sick"
-    admission_date: datetime
-    discharge_date: Optional[datetime] = None
+    admission_date: StoredDatetime
+    discharge_date: Optional[StoredDatetime] = None
 
 class AdmissionPatch(BaseModel):
     diagnosis: Optional[str] = None
     status: Optional[Literal["sick", "healthy"]] = "sick"
-    admission_date: Optional[datetime] = None
-    discharge_date: Optional[datetime] = None
+    admission_date: Optional[StoredDatetime] = None
+    discharge_date: Optional[StoredDatetime] = None
 
 #Patients of a doctor
 class DoctorsPatientPut(BaseModel):
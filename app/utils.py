@@ -1,4 +1,9 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
+from .config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -6,4 +11,94 @@ def hash(password):
     return pwd_context.hash(password)
 
 def verify(plain_pw, hashed_pw):
-    return pwd_context.verify(plain_pw, hashed_pw)
\ No newline at end of file
+    return pwd_context.verify(plain_pw, hashed_pw)
+
+
+#bcrypt runs in its own bounded process pool so a login storm cannot starve the request workers
+_executor = None
+_import_slots = None
+_pending = 0
+_stats = {"completed": 0, "rejected": 0, "total_wait_ms": 0.0, "max_wait_ms": 0.0}
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.password_workers)
+    return _executor
+
+#bulk imports share the pool with logins - across all imports only half the workers (at least one) run import batches,
+#so a verify job never queues behind more than one small batch per busy worker
+def _get_import_slots():
+    global _import_slots
+    if _import_slots is None:
+        _import_slots = asyncio.Semaphore(max(1, settings.password_workers // 2))
+    return _import_slots
+
+#run inside the worker process; reports how long the job sat in the queue
+def _hash_job(password, submitted_at):
+    return hash(password), time.time() - submitted_at
+
+def _hash_many_job(passwords, submitted_at):
+    return [hash(password) for password in passwords], time.time() - submitted_at
+
+def _verify_job(plain_pw, hashed_pw, submitted_at):
+    return verify(plain_pw, hashed_pw), time.time() - submitted_at
+
+async def _submit(job, *args):
+    global _pending
+    if _pending >= settings.password_queue_limit:
+        _stats["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password operations in progress, please try again"
+        )
+
+    _pending += 1
+    try:
+        result, waited = await asyncio.get_running_loop().run_in_executor(_get_executor(), job, *args, time.time())
+    finally:
+        _pending -= 1
+
+    waited_ms = max(waited, 0) * 1000
+    _stats["completed"] += 1
+    _stats["total_wait_ms"] += waited_ms
+    _stats["max_wait_ms"] = max(_stats["max_wait_ms"], waited_ms)
+
+    return result
+
+async def hash_async(password):
+    return await _submit(_hash_job, password)
+
+async def hash_many_async(passwords):
+    #small fixed batches (PASSWORD_BATCH_SIZE per job) through the import slots - a bulk import holds a few queue
+    #slots rather than thousands, and never occupies every worker for minutes
+    passwords = list(passwords)
+    size = settings.password_batch_size
+
+    async def hash_batch(start):
+        async with _get_import_slots():
+            return await _submit(_hash_many_job, passwords[start:start + size])
+
+    batches = await asyncio.gather(*(hash_batch(start) for start in range(0, len(passwords), size)))
+    return [hashed for batch in batches for hashed in batch]
+
+async def verify_async(plain_pw, hashed_pw):
+    return await _submit(_verify_job, plain_pw, hashed_pw)
+
+def password_pool_stats():
+    completed = _stats["completed"]
+    return {
+        "workers": settings.password_workers,
+        "queue_limit": settings.password_queue_limit,
+        "pending": _pending,
+        "completed": completed,
+        "rejected": _stats["rejected"],
+        "avg_wait_ms": round(_stats["total_wait_ms"] / completed, 3) if completed else 0.0,
+        "max_wait_ms": round(_stats["max_wait_ms"], 3)
+    }
+
+def shutdown_password_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
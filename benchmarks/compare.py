@@ -0,0 +1,43 @@
+import argparse
+import json
+import sys
+
+#compares two load/micro result files and exits 1 when anything regressed beyond --threshold percent
+#python -m benchmarks.compare benchmarks/results/base.json benchmarks/results/head.json
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "queries_per_request", "us_per_op")
+HIGHER_IS_BETTER = ("rps",)
+
+def rows(report):
+    for section in ("scenarios", "micro"):
+        for name, metrics in report.get(section, {}).items():
+            for metric, value in metrics.items():
+                if metric in LOWER_IS_BETTER + HIGHER_IS_BETTER and value is not None:
+                    yield f"{name}.{metric}", metric, value
+
+def main(args):
+    with open(args.base) as file:
+        base = {key: value for key, _, value in rows(json.load(file))}
+    with open(args.head) as file:
+        head = list(rows(json.load(file)))
+
+    regressions = 0
+    for key, metric, value in head:
+        if key not in base or not base[key]:
+            continue
+
+        change = (value - base[key]) / base[key] * 100
+        worse = change > args.threshold if metric in LOWER_IS_BETTER else change < -args.threshold
+        regressions += worse
+
+        print(f"{'REGRESSED' if worse else 'ok':10} {key:60} {base[key]:>12} -> {value:>12} ({change:+.1f}%)")
+
+    print(f"{regressions} regression(s) beyond {args.threshold}%")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10, help="allowed change in percent")
+
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,203 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import time
+from datetime import datetime, timezone
+import httpx
+from .synthetic import BENCH_PASSWORD, LAST_NAMES
+
+#drives every router in app/main.py at a fixed concurrency against a seeded server
+#python -m benchmarks.load --base-url http://localhost:8000 --concurrency 32 --requests 2000 --out benchmarks/results/load.json
+QUERIES_PATTERN = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+async def login(client, role: str, user_id: int) -> str:
+    response = await client.post(f"/login/{role}s", data={"username": f"{role}{user_id}@bench.example", "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+#tokens and ids of rows that exist in the seeded dataset
+async def fixtures(client, args):
+    fx = {"patient_tokens": {}, "doctor_tokens": {}, "assignments": []}
+
+    for patient_id in range(1, args.users + 1):
+        fx["patient_tokens"][patient_id] = await login(client, "patient", patient_id)
+
+    for doctor_id in range(1, args.users + 1):
+        fx["doctor_tokens"][doctor_id] = await login(client, "doctor", doctor_id)
+
+        response = await client.get(f"/doctors/{doctor_id}")
+        for admission in response.json()["admissions"][:50]:
+            fx["assignments"].append((doctor_id, admission["patient_id"], admission["id"]))
+
+    if not fx["assignments"]:
+        raise SystemExit("The first --users doctors have no admissions; seed more data or raise --users")
+
+    return fx
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+def scenarios(fx, args):
+    patients = list(fx["patient_tokens"].items())
+
+    def patient(rng):
+        patient_id, token = rng.choice(patients)
+        return patient_id, bearer(token)
+
+    def assignment(rng):
+        doctor_id, patient_id, admission_id = rng.choice(fx["assignments"])
+        return doctor_id, patient_id, admission_id, bearer(fx["doctor_tokens"][doctor_id])
+
+    def patient_admissions(rng):
+        patient_id, headers = patient(rng)
+        return "GET", f"/patients/{patient_id}/admissions/", {"headers": headers}
+
+    def patients_of_doctor(rng):
+        doctor_id, _, _, headers = assignment(rng)
+        return "GET", f"/doctors/{doctor_id}/patients/", {"headers": headers}
+
+    def patient_of_doctor(rng):
+        doctor_id, patient_id, _, headers = assignment(rng)
+        return "GET", f"/doctors/{doctor_id}/patients/{patient_id}", {"headers": headers}
+
+    def doctor_admissions(rng):
+        doctor_id, patient_id, _, headers = assignment(rng)
+        return "GET", f"/doctors/{doctor_id}/patients/{patient_id}/admissions/", {"headers": headers}
+
+    def doctor_admission(rng):
+        doctor_id, patient_id, admission_id, headers = assignment(rng)
+        return "GET", f"/doctors/{doctor_id}/patients/{patient_id}/admissions/{admission_id}", {"headers": headers}
+
+    def admission_search(rng):
+        doctor_id, _, _, headers = assignment(rng)
+        return "GET", f"/admissions/search?doctor_id={doctor_id}&status=sick&limit=50", {"headers": headers}
+
+    def admission_count(rng):
+        doctor_id, _, _, headers = assignment(rng)
+        return "GET", f"/admissions/search/count?doctor_id={doctor_id}&status=sick", {"headers": headers}
+
+    def patient_login(rng):
+        credentials = {"username": f"patient{rng.randint(1, args.users)}@bench.example", "password": BENCH_PASSWORD}
+        return "POST", "/login/patients", {"data": credentials}
+
+    return {
+        "provinces.list": lambda rng: ("GET", "/provinces/?limit=50", {}),
+        "provinces.get": lambda rng: ("GET", f"/provinces/{rng.randint(1, args.provinces)}", {}),
+        "patients.list": lambda rng: ("GET", "/patients/?limit=50", {}),
+        "patients.get": lambda rng: ("GET", f"/patients/{rng.randint(1, args.patients)}", {}),
+        "patients.search": lambda rng: ("GET", f"/patients/search?q={rng.choice(LAST_NAMES)}&limit=20", {}),
+        "patients.search.prefix": lambda rng: ("GET", f"/patients/search?q={rng.choice(LAST_NAMES)[:2]}&limit=20", {}),
+        "p_admissions.list": patient_admissions,
+        "doctors.list": lambda rng: ("GET", "/doctors/?limit=50", {}),
+        "doctors.get": lambda rng: ("GET", f"/doctors/{rng.randint(1, args.doctors)}", {}),
+        "relation.list": patients_of_doctor,
+        "relation.get": patient_of_doctor,
+        "d_admissions.list": doctor_admissions,
+        "d_admissions.get": doctor_admission,
+        "admissions.search": admission_search,
+        "admissions.count": admission_count,
+        "stats.census": lambda rng: ("GET", "/stats/census", {}),
+        "stats.doctors": lambda rng: ("GET", "/stats/doctors?limit=50", {}),
+        "stats.doctors.get": lambda rng: ("GET", f"/stats/doctors/{rng.randint(1, args.doctors)}", {}),
+        "stats.provinces.daily": lambda rng: ("GET", f"/stats/provinces/daily?province_id={rng.randint(1, args.provinces)}", {}),
+        "login.patients": patient_login,
+        "metrics.passwords": lambda rng: ("GET", "/metrics/passwords", {})
+    }
+
+async def run_scenario(client, build, args):
+    rng = random.Random(args.seed)
+    latencies, queries, errors = [], [], 0
+    remaining = args.requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            method, path, kwargs = build(rng)
+
+            started = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+            if response.status_code >= 400:
+                errors += 1
+
+            match = QUERIES_PATTERN.search(response.headers.get("server-timing", ""))
+            if match:
+                queries.append(int(match[1]))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        fx = await fixtures(client, args)
+        selected = scenarios(fx, args)
+        if args.only:
+            selected = {name: build for name, build in selected.items() if name in args.only}
+
+        results = {}
+        for name, build in selected.items():
+            results[name] = await run_scenario(client, build, args)
+            print(f"{name:20} {results[name]['rps']:>9} req/s  p50 {results[name]['p50_ms']:>8} ms  p95 {results[name]['p95_ms']:>8} ms  p99 {results[name]['p99_ms']:>8} ms  queries {results[name]['queries_per_request']}")
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "requests": args.requests
+        },
+        "scenarios": results
+    }
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Wrote {args.out}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fixed-concurrency load test of every router")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--users", type=int, default=10, help="patients/doctors 1..N to log in as")
+    parser.add_argument("--provinces", type=int, default=50, help="must match the seeded dataset")
+    parser.add_argument("--patients", type=int, default=10000, help="must match the seeded dataset")
+    parser.add_argument("--doctors", type=int, default=200, help="must match the seeded dataset")
+    parser.add_argument("--only", nargs="*", help="scenario names to run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="benchmarks/results/load.json")
+
+    asyncio.run(main(parser.parse_args()))
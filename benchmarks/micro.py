@@ -0,0 +1,128 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import timedelta
+
+#the app reads its settings at import time; micro-benchmarks never touch MySQL, so placeholders are enough
+for name, value in {"DATABASE_HOST": "localhost", "DATABASE_USER": "bench", "DATABASE_PASSWORD": "bench", "DATABASE_NAME": "admission",
+                    "SECRET_KEY": "benchmark-secret", "ALGORITHM": "HS256", "TOKEN_MINUTES": "30"}.items():
+    os.environ.setdefault(name, value)
+
+from typing import List
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from app.oauth2 import create_token, token_cache, verify_token
+from app.relationships import load_doctor_graphs, load_patient_graphs
+from app.response import DoctorResponse, PatientResponse
+from app.serialization import FastJSONResponse
+from app.stats import record
+from app.update import dynamic_patch_query
+from .load import git_commit
+from .standin import CensusStandIn, StandInDatabase
+from .synthetic import generate
+
+#python -m benchmarks.micro --out benchmarks/results/micro.json
+def best_per_op(run, number: int, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run(number)
+        timings.append((time.perf_counter() - started) / number)
+    return min(timings) * 1_000_000
+
+def sync_runner(fn):
+    def run(number):
+        for _ in range(number):
+            fn()
+    return run
+
+def async_runner(fn):
+    async def loop(number):
+        for _ in range(number):
+            await fn()
+    return lambda number: asyncio.run(loop(number))
+
+#the same page of graphs returned the default way (models + response_model pass) and through FastJSONResponse,
+#so the difference is the serialization CPU per response (the TestClient overhead is in both)
+def response_client(graphs, model):
+    app = FastAPI()
+
+    @app.get("/default", response_model=List[model])
+    async def default():
+        return [model(**graph) for graph in graphs]
+
+    @app.get("/fast", response_model=List[model])
+    async def fast():
+        return FastJSONResponse(graphs, model=List[model])
+
+    return TestClient(app)
+
+def benchmarks(args):
+    data = generate(args.provinces, args.patients, args.doctors, args.admissions)
+    db = StandInDatabase(data)
+    patients = data["patients"][:args.page]
+    doctors = data["doctors"][:args.page]
+
+    patient_graphs = asyncio.run(load_patient_graphs(patients, db))
+    doctor_graphs = asyncio.run(load_doctor_graphs(doctors, db))
+
+    patient_client = response_client(patient_graphs, PatientResponse)
+    doctor_client = response_client(doctor_graphs, DoctorResponse)
+
+    census = CensusStandIn()
+    admission = {**data["admissions"][0], "province_id": data["patients"][0]["province_id"]}
+    discharged = {**admission, "status": "healthy", "discharge_date": admission["admission_date"] + timedelta(hours=30)}
+
+    token = create_token({"user_id": 1})
+    credentials_exception = HTTPException(status_code=401)
+
+    return {
+        f"relationships.load_patient_graphs[{args.page}]": async_runner(lambda: load_patient_graphs(patients, db)),
+        f"relationships.load_doctor_graphs[{args.page}]": async_runner(lambda: load_doctor_graphs(doctors, db)),
+        "update.dynamic_patch_query": sync_runner(lambda: dynamic_patch_query("admissions", {"diagnosis": "Asthma", "status": "healthy"}, 1, patient_id=2, doctor_id=3)),
+        f"response.PatientResponse[{args.page}]": sync_runner(lambda: [PatientResponse(**graph) for graph in patient_graphs]),
+        f"response.DoctorResponse[{args.page}]": sync_runner(lambda: [DoctorResponse(**graph) for graph in doctor_graphs]),
+        f"serialization.patients.default[{args.page}]": sync_runner(lambda: patient_client.get("/default")),
+        f"serialization.patients.fast[{args.page}]": sync_runner(lambda: patient_client.get("/fast")),
+        f"serialization.doctors.default[{args.page}]": sync_runner(lambda: doctor_client.get("/default")),
+        f"serialization.doctors.fast[{args.page}]": sync_runner(lambda: doctor_client.get("/fast")),
+        f"serialization.FastJSONResponse.render[{args.page}]": sync_runner(lambda: FastJSONResponse(patient_graphs, model=List[PatientResponse])),
+        "stats.record": async_runner(lambda: record(census, added=[discharged], removed=[admission])),
+        "oauth2.verify_token": sync_runner(lambda: verify_token(token, credentials_exception)),
+        "oauth2.verify_token.uncached": sync_runner(lambda: (token_cache.clear(), verify_token(token, credentials_exception)))
+    }
+
+def main(args):
+    results = {}
+    for name, run in benchmarks(args).items():
+        if args.only and name.split("[")[0] not in args.only:
+            continue
+
+        results[name] = {"us_per_op": round(best_per_op(run, args.number, args.repeat), 3)}
+        print(f"{name:50} {results[name]['us_per_op']:>12} us/op")
+
+    report = {
+        "meta": {"commit": git_commit(), "number": args.number, "repeat": args.repeat, "page": args.page},
+        "micro": results
+    }
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Wrote {args.out}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for relationship loading, query building, response models, serialization and auth")
+    parser.add_argument("--provinces", type=int, default=50)
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--doctors", type=int, default=100)
+    parser.add_argument("--admissions", type=int, default=10000)
+    parser.add_argument("--page", type=int, default=50, help="parents per relationship/response benchmark")
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="*", help="benchmark names (without the [page] suffix) to run")
+    parser.add_argument("--out", default="benchmarks/results/micro.json")
+
+    main(parser.parse_args())
@@ -0,0 +1,53 @@
+import argparse
+import asyncio
+from app.database import Database
+from app.stats import rebuild
+from app.utils import hash
+from .synthetic import BENCH_PASSWORD, generate
+
+#seeds the configured database (.env) with a synthetic dataset; run `python -m app.migrations upgrade` first
+#python -m benchmarks.seed --patients 10000 --doctors 200 --admissions 50000 --reset
+TABLES = ("provinces", "patients", "doctors", "admissions")
+
+async def seed(args):
+    data = generate(args.provinces, args.patients, args.doctors, args.admissions, hash(BENCH_PASSWORD), args.seed)
+    db = await Database.connect()
+
+    try:
+        if args.reset:
+            await db.cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+            for table in reversed(TABLES):
+                await db.cursor.execute(f"TRUNCATE TABLE {table}")
+            await db.cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+        for table in TABLES:
+            rows = data[table]
+            columns = list(rows[0].keys())
+            sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+
+            for start in range(0, len(rows), args.chunk_size):
+                chunk = rows[start:start + args.chunk_size]
+                await db.cursor.executemany(sql, [tuple(row[column] for column in columns) for row in chunk])
+                await db.conn.commit()
+
+            print(f"Seeded {len(rows)} {table}")
+
+        #rows went in behind the API's back, so the census counters are recomputed from scratch
+        await rebuild(db)
+        print("Rebuilt census counters")
+
+    finally:
+        await db.close()
+        db.conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed the database with a synthetic, skewed dataset")
+    parser.add_argument("--provinces", type=int, default=50)
+    parser.add_argument("--patients", type=int, default=10000)
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--admissions", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--reset", action="store_true", help="truncate the tables first")
+
+    asyncio.run(seed(parser.parse_args()))
@@ -0,0 +1,100 @@
+import re
+from collections import defaultdict
+from app.stats import DOCTOR_UPSERT, PROVINCE_UPSERT, TOTALS_UPSERT
+
+#in-memory stand-in for the Database wrapper - answers the simple single-table SELECTs the
+#relationship loaders issue (optionally projected, filtered by `col = %s` or `col IN (...)`)
+#so their Python-side cost can be measured without a MySQL server
+SELECT_PATTERN = re.compile(
+    r"^\s*SELECT\s+(?P<columns>.+?)\s+FROM\s+(?P<table>\w+)"
+    r"(?:\s+WHERE\s+(?P<column>\w+)\s+(?:=\s*%s|IN\s*\((?P<placeholders>[%s,\s]+)\)))?\s*$",
+    re.IGNORECASE | re.DOTALL
+)
+
+class StandInCursor:
+    def __init__(self, tables: dict):
+        self.tables = tables
+        self.indexes = {}
+        self.queries = 0
+        self._rows = []
+
+    def _index(self, table: str, column: str):
+        key = (table, column)
+        if key not in self.indexes:
+            index = {}
+            for row in self.tables[table]:
+                index.setdefault(row[column], []).append(row)
+            self.indexes[key] = index
+        return self.indexes[key]
+
+    async def execute(self, sql, params=None):
+        match = SELECT_PATTERN.match(sql)
+        if not match:
+            raise NotImplementedError(f"Stand-in cannot run: {sql}")
+
+        self.queries += 1
+        table, column = match["table"], match["column"]
+
+        if column:
+            index = self._index(table, column)
+            rows = [row for value in params for row in index.get(value, ())]
+        else:
+            rows = self.tables[table]
+
+        columns = match["columns"].strip()
+        if columns != "*":
+            names = [name.strip().split(".")[-1] for name in columns.split(",")]
+            rows = [{name: row[name] for name in names} for row in rows]
+        else:
+            rows = [dict(row) for row in rows]
+
+        self._rows = rows
+
+    async def fetchall(self):
+        return self._rows
+
+    async def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    async def close(self):
+        pass
+
+class StandInDatabase:
+    def __init__(self, tables: dict):
+        self.conn = None
+        self.cursor = StandInCursor(tables)
+
+
+#in-memory stand-in for the census summary tables - applies the upserts app/stats.py record() issues, so the
+#incremental counters can be checked against a full recount without a MySQL server
+class CensusStandIn:
+    def __init__(self):
+        self.conn = None
+        self.cursor = self
+        self.doctors = defaultdict(lambda: [0, 0, 0, 0])
+        self.days = defaultdict(int)
+        self.totals = [0, 0, 0, 0]
+
+    async def execute(self, sql, params=None):
+        if sql == DOCTOR_UPSERT:
+            doctor_id, *values = params
+            self.doctors[doctor_id] = [current + value for current, value in zip(self.doctors[doctor_id], values)]
+        elif sql == PROVINCE_UPSERT:
+            province_id, day, count = params
+            self.days[(province_id, day)] += count
+        elif sql == TOTALS_UPSERT:
+            self.totals = [current + value for current, value in zip(self.totals, params)]
+        else:
+            raise NotImplementedError(f"Stand-in cannot run: {sql}")
+
+    async def executemany(self, sql, rows):
+        for params in rows:
+            await self.execute(sql, params)
+
+    def counters(self) -> dict:
+        #rows that went back to zero are dropped, like the rows a rebuild would never create
+        return {
+            "doctors": {doctor_id: values for doctor_id, values in self.doctors.items() if any(values)},
+            "days": {key: count for key, count in self.days.items() if count},
+            "totals": self.totals
+        }
@@ -0,0 +1,85 @@
+import random
+from datetime import datetime, timedelta
+
+#deterministic synthetic dataset shared by the MySQL seeder and the in-memory stand-in
+#admissions are zipf-skewed: a few doctors and "frequent flyer" patients account for most of them
+BENCH_PASSWORD = "benchmark"
+
+FIRST_NAMES = ["Maria", "Jose", "Ana", "Juan", "Rosa", "Mark", "Grace", "Paolo", "Liza", "Ramon", "Joy", "Carlo", "Bea", "Miguel", "Ella", "Noel"]
+LAST_NAMES = ["Santos", "Reyes", "Cruz", "Bautista", "Garcia", "Mendoza", "Torres", "Flores", "Gonzales", "Ramos", "Aquino", "Castro", "Rivera", "Navarro"]
+PROVINCES = ["Cebu", "Davao del Sur", "Laguna", "Cavite", "Pampanga", "Iloilo", "Batangas", "Bulacan", "Rizal", "Pangasinan", "Negros Occidental", "Leyte"]
+SPECIALTIES = ["Cardiology", "Neurology", "Pediatrics", "Oncology", "Internal Medicine", "Surgery", "Orthopedics", "Dermatology"]
+DIAGNOSES = ["Dengue fever", "Pneumonia", "Hypertension", "Type 2 diabetes", "Asthma", "Gastroenteritis", "Fracture", "Migraine", "Appendicitis", "Influenza"]
+ALLERGIES = ["", "", "", "Penicillin", "Peanuts", "Shellfish", "Latex", "Dust"]
+
+def zipf_weights(n: int, s: float = 1.1):
+    return [1 / (rank ** s) for rank in range(1, n + 1)]
+
+def generate(provinces: int, patients: int, doctors: int, admissions: int, password_hash: str = "", seed: int = 42, now: datetime = None):
+    rng = random.Random(seed)
+    now = now or datetime(2026, 1, 1)
+
+    province_rows = [
+        {"id": i, "name": PROVINCES[(i - 1) % len(PROVINCES)], "city": f"City {i}"}
+        for i in range(1, provinces + 1)
+    ]
+
+    province_weights = zipf_weights(provinces, 0.8)
+    patient_rows = [
+        {
+            "id": i,
+            "province_id": rng.choices(range(1, provinces + 1), province_weights)[0],
+            "first_name": rng.choice(FIRST_NAMES),
+            "last_name": rng.choice(LAST_NAMES),
+            "email": f"patient{i}@bench.example",
+            "password": password_hash,
+            "gender": rng.choice(["Male", "Female", "Others"]),
+            "birth_date": now - timedelta(days=rng.randint(365, 365 * 90)),
+            "allergies": rng.choice(ALLERGIES),
+            "height_cm": round(rng.uniform(140, 195), 1),
+            "weight_kg": round(rng.uniform(40, 120), 1)
+        }
+        for i in range(1, patients + 1)
+    ]
+
+    doctor_rows = [
+        {
+            "id": i,
+            "first_name": rng.choice(FIRST_NAMES),
+            "last_name": rng.choice(LAST_NAMES),
+            "email": f"doctor{i}@bench.example",
+            "password": password_hash,
+            "specialty": rng.choice(SPECIALTIES)
+        }
+        for i in range(1, doctors + 1)
+    ]
+
+    #shuffle the ranks so the busiest doctors/patients are not simply the lowest ids
+    patient_ranks = list(range(1, patients + 1))
+    doctor_ranks = list(range(1, doctors + 1))
+    rng.shuffle(patient_ranks)
+    rng.shuffle(doctor_ranks)
+
+    patient_ids = rng.choices(patient_ranks, zipf_weights(patients), k=admissions)
+    doctor_ids = rng.choices(doctor_ranks, zipf_weights(doctors), k=admissions)
+
+    admission_rows = []
+    for i in range(1, admissions + 1):
+        admitted = now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+        sick = rng.random() < 0.3
+        admission_rows.append({
+            "id": i,
+            "patient_id": patient_ids[i - 1],
+            "doctor_id": doctor_ids[i - 1],
+            "diagnosis": rng.choice(DIAGNOSES),
+            "status": "sick" if sick else "healthy",
+            "admission_date": admitted,
+            "discharge_date": None if sick else admitted + timedelta(hours=rng.randint(6, 24 * 21))
+        })
+
+    return {
+        "provinces": province_rows,
+        "patients": patient_rows,
+        "doctors": doctor_rows,
+        "admissions": admission_rows
+    }
@@ -0,0 +1,6 @@
+import os
+
+#the app reads its settings at import time; these tests never touch MySQL, so placeholders are enough
+for name, value in {"DATABASE_HOST": "localhost", "DATABASE_USER": "test", "DATABASE_PASSWORD": "test", "DATABASE_NAME": "admission",
+                    "SECRET_KEY": "test-secret", "ALGORITHM": "HS256", "TOKEN_MINUTES": "30"}.items():
+    os.environ.setdefault(name, value)
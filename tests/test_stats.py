@@ -0,0 +1,72 @@
+import asyncio
+from datetime import datetime, timedelta
+from app.body import stored_datetime
+from app.stats import record
+from benchmarks.standin import CensusStandIn
+from benchmarks.synthetic import generate
+
+#stats.record() has to leave the same counters as a recount (what `python -m app.stats rebuild` computes)
+#after any sequence of single-row writes, applied the way the admission handlers apply them
+def recount(admissions) -> dict:
+    census = CensusStandIn()
+    for admission in admissions:
+        discharged = admission["discharge_date"] is not None
+        stay = int((admission["discharge_date"] - admission["admission_date"]).total_seconds()) if discharged else 0
+        values = (1, int(admission["status"] == "sick"), int(discharged), stay)
+
+        census.doctors[admission["doctor_id"]] = [current + value for current, value in zip(census.doctors[admission["doctor_id"]], values)]
+        census.days[(admission["province_id"], admission["admission_date"].date())] += 1
+        census.totals = [current + value for current, value in zip(census.totals, values)]
+
+    return census.counters()
+
+def seeded():
+    data = generate(10, 200, 20, 2000)
+    provinces = {patient["id"]: patient["province_id"] for patient in data["patients"]}
+    admissions = {admission["id"]: {**admission, "province_id": provinces[admission["patient_id"]]} for admission in data["admissions"]}
+
+    census = CensusStandIn()
+    asyncio.run(record(census, added=list(admissions.values())))
+    return admissions, census
+
+def test_seed_load_matches_recount():
+    admissions, census = seeded()
+    assert census.counters() == recount(admissions.values())
+
+def test_updates_and_deletes_match_recount():
+    admissions, census = seeded()
+
+    async def writes():
+        for id, existing in list(admissions.items()):
+            if id % 11 == 0:
+                del admissions[id]
+                await record(census, removed=[existing])
+            elif id % 7 == 0 and existing["status"] == "sick":
+                admissions[id] = {**existing, "status": "healthy", "discharge_date": existing["admission_date"] + timedelta(hours=30)}
+                await record(census, added=[admissions[id]], removed=[existing])
+            elif id % 5 == 0 and existing["status"] == "healthy":
+                admissions[id] = {**existing, "status": "sick", "discharge_date": None}
+                await record(census, added=[admissions[id]], removed=[existing])
+
+    asyncio.run(writes())
+    assert census.counters() == recount(admissions.values())
+
+def test_offset_aware_client_dates_are_stored_as_naive_utc():
+    #a PUT with "2026-01-01T08:00:00+08:00" is midnight UTC; the delta must use the stored (naive UTC) values
+    admission = {"doctor_id": 1, "province_id": 1, "status": "sick", "admission_date": datetime(2025, 12, 31, 12), "discharge_date": None}
+    discharged = {**admission, "status": "healthy", "discharge_date": stored_datetime(datetime.fromisoformat("2026-01-01T08:00:00.5+08:00"))}
+    assert discharged["discharge_date"] == datetime(2026, 1, 1)
+
+    census = CensusStandIn()
+    asyncio.run(record(census, added=[admission]))
+    asyncio.run(record(census, added=[discharged], removed=[admission]))
+
+    assert census.counters() == recount([discharged])
+    assert census.counters()["totals"] == [1, 0, 1, 12 * 3600]
+
+def test_unchanged_row_records_nothing():
+    admission = {"doctor_id": 1, "province_id": 1, "status": "sick", "admission_date": datetime(2026, 1, 1), "discharge_date": None}
+    census = CensusStandIn()
+    asyncio.run(record(census, added=[admission], removed=[admission]))
+
+    assert census.counters() == {"doctors": {}, "days": {}, "totals": [0, 0, 0, 0]}